@@ -0,0 +1,305 @@
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+try:
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from SocketServer import ThreadingMixIn
+
+import argparse, datetime, ipaddress, json, multiprocessing, os, platform, shutil, ssl, subprocess, sys, tempfile, time
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  disable_nagle_algorithm = True
+
+  def do_GET(self):
+    self.respond()
+
+  def do_POST(self):
+    self.respond()
+
+  def do_PUT(self):
+    self.respond()
+
+  def respond(self):
+    self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    time.sleep(self.server.latency)
+
+    if self.path.startswith('/sms/json'):
+      body = {'message-count': '1', 'messages': [{'to': '447525856424', 'message-id': '0A0000000123ABCD1', 'status': '0', 'remaining-balance': '3.14159265', 'message-price': '0.03330000', 'network': '12345'}]}
+    else:
+      body = {'uuid': '63f61863-4a51-4f6b-86e1-46edebcf9356', 'status': 'started', 'direction': 'outbound'}
+
+    body = json.dumps(body).encode('utf-8')
+
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+  def __init__(self, latency, certfile, keyfile):
+    HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+
+    self.latency = latency
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+
+    self.socket = context.wrap_socket(self.socket, server_side=True)
+
+
+def serve(latency, certfile, keyfile, ports):
+  server = StubServer(latency, certfile, keyfile)
+
+  ports.put(server.server_address[1])
+
+  server.serve_forever()
+
+
+def generate_certificate(directory):
+  key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+  name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, u'127.0.0.1')])
+
+  now = datetime.datetime.utcnow()
+
+  certificate = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+    .serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1)) \
+    .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(u'127.0.0.1'))]), critical=False) \
+    .sign(key, hashes.SHA256(), default_backend())
+
+  certfile, keyfile = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+
+  with open(certfile, 'wb') as fd:
+    fd.write(certificate.public_bytes(serialization.Encoding.PEM))
+
+  with open(keyfile, 'wb') as fd:
+    fd.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()))
+
+  return certfile, keyfile
+
+
+def client(host, certfile, **kwargs):
+  import nexmo
+
+  private_key = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test', 'private_key.txt')).read()
+
+  client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', application_id='nexmo-application-id', private_key=private_key, **kwargs)
+  client.host = client.api_host = host
+  client.session(host).trust_env = False
+  client.session(host).verify = certfile
+
+  return client
+
+
+def measure(function, count):
+  start = clock()
+
+  function(count)
+
+  seconds = clock() - start
+
+  return {'operations': count, 'seconds': seconds, 'rate': count / seconds}
+
+
+def message(n):
+  return {'from': 'Python', 'to': '44752585{0:04d}'.format(n % 10000), 'text': 'Hello world'}
+
+
+def bench_send_message_sequential(host, certfile, options):
+  nexmo_client = client(host, certfile)
+
+  def run(count):
+    for n in range(count):
+      nexmo_client.send_message(message(n))
+
+  return measure(run, options.requests)
+
+
+def bench_send_message_concurrent(host, certfile, options):
+  nexmo_client = client(host, certfile, pool_maxsize=options.workers)
+
+  def run(count):
+    for result in nexmo_client.send_messages((message(n) for n in range(count)), workers=options.workers):
+      if result.error is not None:
+        raise result.error
+
+  return measure(run, options.requests)
+
+
+def bench_send_message_memory(host, certfile, options):
+  import nexmo
+
+  body = json.dumps({'message-count': '1', 'messages': [{'to': '447525856424', 'message-id': '0A0000000123ABCD1', 'status': '0'}]})
+
+  nexmo_client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', transport=nexmo.MemoryTransport(lambda request: (200, {}, body)))
+
+  def run(count):
+    for n in range(count):
+      nexmo_client.send_message(message(n))
+
+  return measure(run, options.requests)
+
+
+def bench_send_message_template_memory(host, certfile, options):
+  import nexmo
+
+  body = json.dumps({'message-count': '1', 'messages': [{'to': '447525856424', 'message-id': '0A0000000123ABCD1', 'status': '0'}]})
+
+  nexmo_client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', transport=nexmo.MemoryTransport(lambda request: (200, {}, body)))
+
+  template = nexmo_client.message_template({'from': 'Python', 'type': 'text', 'callback': 'https://example.com/receipts'})
+
+  def run(count):
+    for n in range(count):
+      template.send({'to': '44752585{0:04d}'.format(n % 10000), 'text': 'Hello world'})
+
+  return measure(run, options.requests)
+
+
+def bench_create_call(host, certfile, options):
+  nexmo_client = client(host, certfile)
+
+  def run(count):
+    for n in range(count):
+      nexmo_client.create_call({'to': [{'type': 'phone', 'number': '14843331234'}], 'answer_url': ['https://example.com/answer']})
+
+  return measure(run, options.requests)
+
+
+def bench_create_call_token_per_request(host, certfile, options):
+  nexmo_client = client(host, certfile, token_per_request=True)
+
+  def run(count):
+    for n in range(count):
+      nexmo_client.create_call({'to': [{'type': 'phone', 'number': '14843331234'}], 'answer_url': ['https://example.com/answer']})
+
+  return measure(run, options.requests)
+
+
+def bench_check_signature(host, certfile, options):
+  import nexmo
+
+  nexmo_client = nexmo.Client(signature_secret='secret')
+
+  params = {'msisdn': '447700900000', 'to': '447700900001', 'messageId': '0A0000000123ABCD1', 'text': 'Hello world', 'type': 'text', 'message-timestamp': '2016-04-25 17:29:56', 'timestamp': '1461605396'}
+  params['sig'] = nexmo_client.signature(params)
+
+  def run(count):
+    for n in range(count):
+      nexmo_client.check_signature(params)
+
+  return measure(run, options.signatures)
+
+
+def bench_import(host, certfile, options):
+  code = 'import time; start = time.time(); import nexmo; print(time.time() - start)'
+
+  cwd = os.path.dirname(os.path.abspath(__file__))
+
+  timings = sorted(float(subprocess.check_output([sys.executable, '-c', code], cwd=cwd)) for n in range(options.imports))
+
+  return {'operations': options.imports, 'seconds': timings[len(timings) // 2], 'rate': 1 / timings[len(timings) // 2]}
+
+
+benchmarks = [
+  ('send_message_sequential', bench_send_message_sequential),
+  ('send_message_concurrent', bench_send_message_concurrent),
+  ('send_message_memory', bench_send_message_memory),
+  ('send_message_template_memory', bench_send_message_template_memory),
+  ('create_call', bench_create_call),
+  ('create_call_token_per_request', bench_create_call_token_per_request),
+  ('check_signature', bench_check_signature),
+  ('import', bench_import)
+]
+
+
+def compare(results, previous):
+  for name, result in sorted(results['benchmarks'].items()):
+    if name in previous['benchmarks']:
+      change = result['rate'] / previous['benchmarks'][name]['rate'] - 1
+
+      print('{0:32} {1:12.1f}/s {2:+8.1%}'.format(name, result['rate'], change))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmark the nexmo client against a local stub server')
+  parser.add_argument('--latency', type=float, default=0.005, help='stub server latency in seconds')
+  parser.add_argument('--requests', type=int, default=500, help='number of requests per benchmark')
+  parser.add_argument('--workers', type=int, default=20, help='number of workers for concurrent benchmarks')
+  parser.add_argument('--signatures', type=int, default=100000, help='number of signatures to check')
+  parser.add_argument('--imports', type=int, default=5, help='number of import time measurements')
+  parser.add_argument('--max-import-time', type=float, help='fail if importing nexmo takes longer than this many seconds')
+  parser.add_argument('--only', action='append', help='run only the named benchmark')
+  parser.add_argument('--output', help='save results as JSON to this file')
+  parser.add_argument('--compare', help='compare results with a previously saved JSON file')
+
+  options = parser.parse_args(argv)
+
+  import nexmo
+
+  directory = tempfile.mkdtemp()
+
+  try:
+    certfile, keyfile = generate_certificate(directory)
+
+    ports = multiprocessing.Queue()
+
+    server = multiprocessing.Process(target=serve, args=(options.latency, certfile, keyfile, ports))
+    server.daemon = True
+    server.start()
+
+    host = '127.0.0.1:{0}'.format(ports.get(timeout=30))
+
+    results = {'version': nexmo.__version__, 'python': platform.python_version(), 'latency': options.latency, 'benchmarks': {}}
+
+    for name, benchmark in benchmarks:
+      if options.only and name not in options.only:
+        continue
+
+      result = results['benchmarks'][name] = benchmark(host, certfile, options)
+
+      print('{0:32} {1:12.1f}/s {2:10.3f}s'.format(name, result['rate'], result['seconds']))
+
+    server.terminate()
+  finally:
+    shutil.rmtree(directory)
+
+  if options.output:
+    with open(options.output, 'w') as fd:
+      json.dump(results, fd, indent=2, sort_keys=True)
+
+  if options.compare:
+    with open(options.compare) as fd:
+      compare(results, json.load(fd))
+
+  if options.max_import_time and results['benchmarks'].get('import', {}).get('seconds', 0) > options.max_import_time:
+    sys.exit('import time exceeds {0}s'.format(options.max_import_time))
+
+  return results
+
+
+if __name__ == '__main__':
+  main()
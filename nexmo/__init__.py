@@ -1,7 +1,16 @@
 __version__ = '1.4.0'
 
 
-import requests, os, warnings, hashlib, hmac, jwt, time, uuid
+try:
+  from urllib.parse import urlencode
+except ImportError:
+  from urllib import urlencode
+
+import os, sys, warnings, hashlib, hmac, time, threading, collections, random, functools, bisect, json, copy
+
+import email.utils
+
+import concurrent.futures
 
 from platform import python_version
 
@@ -22,6 +31,631 @@ class AuthenticationError(ClientError):
   pass
 
 
+class CircuitOpenError(ServerError):
+  pass
+
+
+class DeadlineExceededError(Error):
+  pass
+
+
+class VerificationExpiredError(DeadlineExceededError):
+  def __init__(self, message, verification=None):
+    super(VerificationExpiredError, self).__init__(message)
+
+    self.verification = verification
+
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class RateLimiter(object):
+  families = [
+    ('/sms/', 'sms'),
+    ('/sc/', 'sms'),
+    ('/ussd', 'sms'),
+    ('/verify/', 'verify'),
+    ('/v1/calls', 'voice'),
+    ('/call/', 'voice'),
+    ('/tts', 'voice'),
+    ('/number/format/', 'number_insight'),
+    ('/number/lookup/', 'number_insight'),
+    ('/ni/', 'number_insight')
+  ]
+
+  def __init__(self, rates=None, decrease=0.5, increase=0.1, minimum=0.5):
+    self.rates = dict({'sms': 30, 'verify': 10, 'voice': 3, 'number_insight': 10}, **(rates or {}))
+
+    self.decrease = decrease
+
+    self.increase = increase
+
+    self.minimum = minimum
+
+    self.buckets = {}
+
+    self.lock = threading.Lock()
+
+  def family(self, request_uri):
+    for prefix, family in self.families:
+      if request_uri.startswith(prefix):
+        return family
+
+  def bucket(self, host, request_uri):
+    family = self.family(request_uri)
+
+    if self.rates.get(family) is None:
+      return None
+
+    key = (host, family)
+
+    if key not in self.buckets:
+      rate = float(self.rates[family])
+
+      self.buckets[key] = {'limit': rate, 'rate': rate, 'tokens': 1.0, 'updated': monotonic()}
+
+    return self.buckets[key]
+
+  def reserve(self, host, request_uri):
+    with self.lock:
+      bucket = self.bucket(host, request_uri)
+
+      if bucket is None:
+        return 0
+
+      now = monotonic()
+
+      bucket['tokens'] = min(1.0, bucket['tokens'] + (now - bucket['updated']) * bucket['rate']) - 1
+      bucket['updated'] = now
+
+      return max(0, -bucket['tokens'] / bucket['rate'])
+
+  def acquire(self, host, request_uri):
+    delay = self.reserve(host, request_uri)
+
+    if delay > 0:
+      time.sleep(delay)
+
+  def update(self, host, request_uri, status_code):
+    with self.lock:
+      bucket = self.bucket(host, request_uri)
+
+      if bucket is None:
+        return
+      elif status_code == 429:
+        bucket['rate'] = max(self.minimum, bucket['rate'] * self.decrease)
+      else:
+        bucket['rate'] = min(bucket['limit'], bucket['rate'] + self.increase)
+
+  def rate(self, host, request_uri):
+    with self.lock:
+      bucket = self.bucket(host, request_uri)
+
+      return None if bucket is None else bucket['rate']
+
+
+class Retry(object):
+  def __init__(self, attempts=3, backoff=0.5, max_backoff=30, jitter=True, statuses=(429, 500, 502, 503, 504), methods=('GET',), endpoints=None, retry_after=True):
+    self.attempts = attempts
+
+    self.backoff = backoff
+
+    self.max_backoff = max_backoff
+
+    self.jitter = jitter
+
+    self.statuses = frozenset(statuses)
+
+    self.methods = frozenset(methods)
+
+    self.endpoints = endpoints or {}
+
+    self.retry_after = retry_after
+
+  def allowed(self, method, request_uri):
+    prefixes = [prefix for prefix in self.endpoints if request_uri.startswith(prefix)]
+
+    if prefixes:
+      return self.endpoints[max(prefixes, key=len)]
+
+    return method in self.methods
+
+  def should_retry(self, method, request_uri, attempt, status_code=None):
+    if attempt >= self.attempts or not self.allowed(method, request_uri):
+      return False
+
+    return status_code is None or status_code in self.statuses
+
+  def delay(self, attempt, response=None):
+    if self.retry_after and response is not None and response.headers.get('Retry-After'):
+      return min(self.max_backoff, self.parse_retry_after(response.headers['Retry-After']))
+
+    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+
+    return random.uniform(0, delay) if self.jitter else delay
+
+  def parse_retry_after(self, value):
+    try:
+      return max(0, float(value))
+    except ValueError:
+      date = email.utils.parsedate_tz(value)
+
+      return 0 if date is None else max(0, email.utils.mktime_tz(date) - time.time())
+
+
+class CircuitBreaker(object):
+  def __init__(self, failure_threshold=5, recovery_timeout=30, half_open_requests=1):
+    self.failure_threshold = failure_threshold
+
+    self.recovery_timeout = recovery_timeout
+
+    self.half_open_requests = half_open_requests
+
+    self.circuits = {}
+
+    self.lock = threading.Lock()
+
+  def circuit(self, host):
+    if host not in self.circuits:
+      self.circuits[host] = {'state': 'closed', 'failures': 0, 'opened': 0, 'probes': 0}
+
+    return self.circuits[host]
+
+  def allow(self, host, emit=None):
+    with self.lock:
+      circuit = self.circuit(host)
+
+      previous = circuit['state']
+
+      if previous == 'open' and monotonic() >= circuit['opened'] + self.recovery_timeout:
+        circuit['state'], circuit['probes'] = 'half_open', 0
+
+      allowed = circuit['state'] == 'closed' or (circuit['state'] == 'half_open' and circuit['probes'] < self.half_open_requests)
+
+      if allowed and circuit['state'] == 'half_open':
+        circuit['probes'] += 1
+
+      state = circuit['state']
+
+    self.publish(host, previous, state, emit)
+
+    if not allowed:
+      raise CircuitOpenError('circuit open for {host}'.format(host=host))
+
+  def record(self, host, failed, emit=None):
+    with self.lock:
+      circuit = self.circuit(host)
+
+      previous = circuit['state']
+
+      if not failed:
+        circuit['failures'] = 0
+
+        if previous == 'half_open':
+          circuit['state'] = 'closed'
+      else:
+        circuit['failures'] += 1
+
+        if previous == 'half_open' or circuit['failures'] >= self.failure_threshold:
+          circuit['state'], circuit['opened'] = 'open', monotonic()
+
+      state = circuit['state']
+
+    self.publish(host, previous, state, emit)
+
+  def release(self, host):
+    with self.lock:
+      circuit = self.circuit(host)
+
+      if circuit['state'] == 'half_open' and circuit['probes'] > 0:
+        circuit['probes'] -= 1
+
+  def publish(self, host, previous, state, emit):
+    if emit is not None and state != previous:
+      emit('circuit', {'host': host, 'previous': previous, 'state': state})
+
+  def state(self, host):
+    with self.lock:
+      return self.circuit(host)['state']
+
+
+class Hedge(object):
+  endpoints = (
+    '/account/get-balance',
+    '/account/get-pricing/',
+    '/account/get-prefix-pricing/',
+    '/account/get-phone-pricing/',
+    '/search/message',
+    '/verify/search/',
+    '/number/format/',
+    '/number/lookup/'
+  )
+
+  def __init__(self, percentile=0.95, after=None, min_samples=20, workers=10):
+    self.percentile = percentile
+
+    self.after = after
+
+    self.min_samples = min_samples
+
+    self.workers = workers
+
+    self.pool = None
+
+    self.lock = threading.Lock()
+
+  def allowed(self, method, request_uri):
+    if method != 'GET':
+      return False
+
+    return any(request_uri == endpoint or (endpoint.endswith('/') and request_uri.startswith(endpoint)) for endpoint in self.endpoints)
+
+  def delay(self, histogram):
+    if self.after is not None:
+      return self.after
+
+    if histogram is None or histogram.count < self.min_samples:
+      return None
+
+    delay = histogram.percentile(self.percentile)
+
+    return None if delay == float('inf') else delay
+
+  def executor(self):
+    if self.pool is None:
+      with self.lock:
+        if self.pool is None:
+          self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+    return self.pool
+
+  def close(self):
+    with self.lock:
+      pool, self.pool = self.pool, None
+
+    if pool is not None:
+      pool.shutdown(wait=False)
+
+
+class MessageTemplate(object):
+  def __init__(self, client, params, host=None, request_uri='/sms/json'):
+    self.client = client
+
+    self.host = host or client.host
+
+    self.request_uri = request_uri
+
+    self.params = dict(params, api_key=client.api_key, api_secret=client.api_secret)
+
+    self.keys = frozenset(self.params)
+
+    self.prefix = form_encode(self.params)
+
+    self.headers = dict(client.headers, **{'Content-Type': 'application/x-www-form-urlencoded'})
+
+  def encode(self, params):
+    if not params:
+      return self.prefix
+    elif self.keys.isdisjoint(params):
+      return b'&'.join(body for body in (self.prefix, form_encode(params)) if body)
+    else:
+      return form_encode(dict(self.params, **params))
+
+  def send(self, params):
+    return self.client.request('POST', self.host, self.request_uri, data=self.encode(params), headers=self.headers)
+
+
+def form_encode(params):
+  return urlencode([(key, value.encode('utf-8') if isinstance(value, type(u'')) else value) for key, value in params.items() if value is not None], doseq=True).encode('ascii')
+
+
+class Cache(object):
+  missing = object()
+
+  def __init__(self, maxsize=1024, ttl=3600):
+    self.maxsize = maxsize
+
+    self.ttl = ttl
+
+    self.entries = collections.OrderedDict()
+
+    self.hits = 0
+
+    self.misses = 0
+
+    self.evictions = 0
+
+    self.lock = threading.Lock()
+
+  def get(self, key, default=None):
+    with self.lock:
+      entry = self.entries.pop(key, None)
+
+      if entry is None or entry[0] <= monotonic():
+        self.misses += 1
+
+        return default
+
+      self.entries[key] = entry
+
+      self.hits += 1
+
+      return entry[1]
+
+  def set(self, key, value):
+    with self.lock:
+      self.entries.pop(key, None)
+
+      self.entries[key] = (monotonic() + self.ttl, value)
+
+      while len(self.entries) > self.maxsize:
+        self.entries.popitem(last=False)
+
+        self.evictions += 1
+
+  def invalidate(self, *keys):
+    with self.lock:
+      if not keys:
+        self.entries.clear()
+
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def stats(self):
+    with self.lock:
+      return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.entries)}
+
+
+class SingleFlight(object):
+  def __init__(self):
+    self.calls = {}
+
+    self.lock = threading.Lock()
+
+  def do(self, key, function, *args):
+    with self.lock:
+      call = self.calls.get(key)
+
+      if call is not None:
+        leader = False
+      else:
+        leader, call = True, concurrent.futures.Future()
+
+        self.calls[key] = call
+
+    if not leader:
+      return call.result()
+
+    try:
+      result = function(*args)
+    except BaseException as error:
+      call.set_exception(error)
+
+      raise
+    else:
+      call.set_result(result)
+
+      return result
+    finally:
+      with self.lock:
+        del self.calls[key]
+
+
+class MessageBatcher(object):
+  def __init__(self, window=0.01, size=10):
+    self.window = window
+
+    self.size = size
+
+    self.pending = collections.OrderedDict()
+
+    self.scheduled = False
+
+    self.lock = threading.Lock()
+
+  def add(self, message_id, future):
+    with self.lock:
+      self.pending.setdefault(str(message_id), []).append(future)
+
+      if len(self.pending) >= self.size:
+        return self.take_locked(), False
+
+      schedule, self.scheduled = not self.scheduled, True
+
+      return None, schedule
+
+  def take(self):
+    with self.lock:
+      return self.take_locked()
+
+  def take_locked(self):
+    batch, self.pending, self.scheduled = self.pending, collections.OrderedDict(), False
+
+    return batch
+
+  def resolve(self, batch, response=None, error=None):
+    items = {} if response is None else dict((str(item.get('message-id')), item) for item in response.get('items', []))
+
+    for message_id, futures in batch.items():
+      for future in futures:
+        if future.done():
+          continue
+        elif error is not None:
+          future.set_exception(error)
+        elif message_id in items:
+          future.set_result(items[message_id])
+        else:
+          future.set_exception(ClientError('message {0} not found'.format(message_id)))
+
+
+def signature(secret, method, params):
+  if method == 'md5hash':
+    data = ''.join(['&%s=%s' % (key, params[key]) for key in sorted(params)])
+
+    return hashlib.md5(data.encode('utf-8') + secret).hexdigest()
+
+  data = ''.join(['&%s=%s' % (key, ('%s' % params[key]).replace('&', '_').replace('=', '_')) for key in sorted(params)])
+
+  return hmac.new(secret, data.encode('utf-8'), getattr(hashlib, method)).hexdigest()
+
+
+def check_signature(secret, method, params):
+  params = dict(params)
+
+  expected = params.pop('sig', '')
+
+  return hmac.compare_digest(expected.lower(), signature(secret, method, params))
+
+
+class Histogram(object):
+  buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+  def __init__(self):
+    self.counts = [0] * len(self.buckets)
+
+    self.count = 0
+
+    self.sum = 0.0
+
+  def observe(self, value):
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    self.count += 1
+
+    self.sum += value
+
+  def percentile(self, q):
+    if self.count == 0:
+      return None
+
+    rank, total = q * self.count, 0
+
+    for bucket, count in zip(self.buckets, self.counts):
+      total += count
+
+      if total >= rank:
+        return bucket
+
+  def snapshot(self):
+    return {
+      'buckets': list(zip(self.buckets, self.counts)),
+      'count': self.count,
+      'sum': self.sum,
+      'p50': self.percentile(0.5),
+      'p90': self.percentile(0.9),
+      'p99': self.percentile(0.99)
+    }
+
+
+class Metrics(object):
+  def __init__(self):
+    self.endpoints = {}
+
+    self.lock = threading.Lock()
+
+  def record(self, event):
+    key = event['method'] + ' ' + event['endpoint']
+
+    with self.lock:
+      if key not in self.endpoints:
+        self.endpoints[key] = {'requests': 0, 'errors': 0, 'statuses': {}, 'latency': Histogram()}
+
+      metrics = self.endpoints[key]
+      metrics['requests'] += 1
+      metrics['latency'].observe(event['total'])
+
+      if event['error'] is not None or event['status'] >= 400:
+        metrics['errors'] += 1
+
+      if event['status'] is not None:
+        metrics['statuses'][event['status']] = metrics['statuses'].get(event['status'], 0) + 1
+
+  def latency(self, method, endpoint):
+    with self.lock:
+      metrics = self.endpoints.get(method + ' ' + endpoint)
+
+      return None if metrics is None else metrics['latency']
+
+  def snapshot(self):
+    with self.lock:
+      return dict((key, dict(metrics, statuses=dict(metrics['statuses']), latency=metrics['latency'].snapshot())) for key, metrics in self.endpoints.items())
+
+
+class JSONCodec(object):
+  def loads(self, data):
+    if sys.version_info < (3, 6) and isinstance(data, bytes) and str is not bytes:
+      data = data.decode('utf-8')
+
+    return json.loads(data)
+
+  def dumps(self, obj):
+    return json.dumps(obj).encode('utf-8')
+
+
+BulkResult = collections.namedtuple('BulkResult', ['params', 'response', 'error'])
+
+
+def bulk(function, items, workers=10, ordered=False):
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+  pending = collections.deque() if ordered else set()
+
+  add = pending.append if ordered else pending.add
+
+  try:
+    for params in items:
+      if len(pending) >= workers * 2:
+        for result in completed(pending, ordered):
+          yield result
+
+      add(executor.submit(call, function, params))
+
+    while pending:
+      for result in completed(pending, ordered):
+        yield result
+  finally:
+    for future in pending:
+      future.cancel()
+
+    executor.shutdown(wait=False)
+
+
+def call(function, params):
+  try:
+    return BulkResult(params, function(params), None)
+  except Exception as error:
+    return BulkResult(params, None, error)
+
+
+def spawn(function, *args):
+  future = concurrent.futures.Future()
+
+  def run():
+    try:
+      result = function(*args)
+    except BaseException as error:
+      future.set_exception(error)
+    else:
+      future.set_result(result)
+
+  thread = threading.Thread(target=run)
+  thread.daemon = True
+  thread.start()
+
+  return future
+
+
+def completed(pending, ordered):
+  if ordered:
+    return [pending.popleft().result()]
+
+  done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+  pending.difference_update(done)
+
+  return [future.result() for future in done]
+
+
 class Client():
   def __init__(self, **kwargs):
     self.api_key = kwargs.get('key', None) or os.environ.get('NEXMO_API_KEY', None)
@@ -30,6 +664,14 @@ class Client():
 
     self.signature_secret = kwargs.get('signature_secret', None) or os.environ.get('NEXMO_SIGNATURE_SECRET', None)
 
+    self.signature_method = kwargs.get('signature_method', None) or os.environ.get('NEXMO_SIGNATURE_METHOD', 'md5hash')
+
+    self.signature_secret_bytes = None
+
+    self.signature_pool = None
+
+    self.signature_lock = threading.Lock()
+
     self.application_id = kwargs.get('application_id', None)
 
     self.private_key = kwargs.get('private_key', None)
@@ -47,26 +689,147 @@ class Client():
 
     self.auth_params = {}
 
+    self.token_ttl = kwargs.get('token_ttl', 60)
+
+    self.token_refresh_margin = kwargs.get('token_refresh_margin', 10)
+
+    self.token_per_request = kwargs.get('token_per_request', False)
+
+    self.token = None
+
+    self.token_expires = 0
+
+    self.token_signer = None
+
+    self.token_lock = threading.Lock()
+
+    self.signing_key = None
+
+    self.pool_connections = kwargs.get('pool_connections', 1)
+
+    self.pool_maxsize = kwargs.get('pool_maxsize', 10)
+
+    self.pool_block = kwargs.get('pool_block', False)
+
+    self.rate_limiter = kwargs.get('rate_limiter', None)
+
+    self.retry = kwargs.get('retry', None)
+
+    self.circuit_breaker = kwargs.get('circuit_breaker', None)
+
+    self.timeout = kwargs.get('timeout', None)
+
+    self.deadline = kwargs.get('deadline', None)
+
+    self.hedge = kwargs.get('hedge', None)
+
+    self.pricing_cache = kwargs.get('pricing_cache', None)
+
+    self.insight_cache = kwargs.get('insight_cache', None)
+
+    self.flights = SingleFlight() if kwargs.get('single_flight', False) else None
+
+    self.message_batcher = None if kwargs.get('message_lookup_window') is None else MessageBatcher(kwargs['message_lookup_window'])
+
+    self.codec = kwargs.get('codec', None) or JSONCodec()
+
+    self.typed_responses = kwargs.get('typed_responses', False)
+
+    self.hooks = {}
+
+    self.metrics = Metrics()
+
+    self.base_uris = kwargs.get('base_uris', None) or {}
+
+    if kwargs.get('transport', None) is not None:
+      self.transport = kwargs['transport']
+    elif kwargs.get('http2', False):
+      self.transport = HTTP2Transport()
+    else:
+      self.transport = RequestsTransport(self.pool_connections, self.pool_maxsize, self.pool_block)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def session(self, host):
+    return self.transport.session(host)
+
+  @property
+  def sessions(self):
+    return getattr(self.transport, 'sessions', {})
+
+  def close(self):
+    self.transport.close()
+
+    if self.hedge is not None:
+      self.hedge.close()
+
+    with self.signature_lock:
+      pool, self.signature_pool = self.signature_pool, None
+
+    if pool is not None:
+      pool[1].shutdown(wait=False)
+
+  def options(self, **kwargs):
+    unknown = set(kwargs) - set(['timeout', 'deadline', 'hedge'])
+
+    if unknown:
+      raise TypeError('unexpected options: {0}'.format(', '.join(sorted(unknown))))
+
+    client = copy.copy(self)
+    client.__dict__.update(kwargs)
+
+    return client
+
+  def on(self, event, callback):
+    self.hooks.setdefault(event, []).append(callback)
+
+  def emit(self, event, payload):
+    for callback in self.hooks.get(event, ()):
+      callback(payload)
+
+  def stats(self):
+    return self.metrics.snapshot()
+
   def auth(self, params=None, **kwargs):
     self.auth_params = params or kwargs
 
+    with self.token_lock:
+      self.token = None
+
   def send_message(self, params):
     return self.post(self.host, '/sms/json', params)
 
+  def estimate_message(self, params):
+    from nexmo import sms
+
+    analysis = sms.analyse(params.get('text', ''), params.get('type'))
+
+    return analysis, float(self.get_sms_pricing(params['to'])['price']) * analysis.segments
+
+  def message_template(self, params=None, **kwargs):
+    return MessageTemplate(self, params or kwargs)
+
+  def send_messages(self, messages, workers=10, ordered=False, template=None):
+    return bulk(self.send_message if template is None else template.send, messages, workers, ordered)
+
   def get_balance(self):
     return self.get(self.host, '/account/get-balance')
 
   def get_country_pricing(self, country_code):
-    return self.get(self.host, '/account/get-pricing/outbound', {'country': country_code})
+    return self.cached(self.pricing_cache, self.get, self.host, '/account/get-pricing/outbound', {'country': country_code})
 
   def get_prefix_pricing(self, prefix):
-    return self.get(self.host, '/account/get-prefix-pricing/outbound', {'prefix': prefix})
+    return self.cached(self.pricing_cache, self.get, self.host, '/account/get-prefix-pricing/outbound', {'prefix': prefix})
 
   def get_sms_pricing(self, number):
-    return self.get(self.host, '/account/get-phone-pricing/outbound/sms', {'phone': number})
+    return self.cached(self.pricing_cache, self.get, self.host, '/account/get-phone-pricing/outbound/sms', {'phone': number})
 
   def get_voice_pricing(self, number):
-    return self.get(self.host, '/account/get-phone-pricing/outbound/voice', {'phone': number})
+    return self.cached(self.pricing_cache, self.get, self.host, '/account/get-phone-pricing/outbound/voice', {'phone': number})
 
   def update_settings(self, params=None, **kwargs):
     return self.post(self.host, '/account/settings', params or kwargs)
@@ -80,6 +843,14 @@ class Client():
   def get_available_numbers(self, country_code, params=None, **kwargs):
     return self.get(self.host, '/number/search', dict(params or kwargs, country=country_code))
 
+  def iter_account_numbers(self, params=None, prefetch=False, **kwargs):
+    return self.paginate(self.get_account_numbers, params or kwargs, ('numbers',), 'index', 'size', 1, prefetch=prefetch)
+
+  def iter_available_numbers(self, country_code, params=None, prefetch=False, **kwargs):
+    method = lambda params: self.get_available_numbers(country_code, params)
+
+    return self.paginate(method, params or kwargs, ('numbers',), 'index', 'size', 1, prefetch=prefetch)
+
   def buy_number(self, params=None, **kwargs):
     return self.post(self.host, '/number/buy', params or kwargs)
 
@@ -90,7 +861,35 @@ class Client():
     return self.post(self.host, '/number/update', params or kwargs)
 
   def get_message(self, message_id):
-    return self.get(self.host, '/search/message', {'id': message_id})
+    if self.message_batcher is None:
+      return self.get(self.host, '/search/message', {'id': message_id})
+
+    future = concurrent.futures.Future()
+
+    batch, schedule = self.message_batcher.add(message_id, future)
+
+    if schedule:
+      timer = threading.Timer(self.message_batcher.window, self.lookup_messages)
+      timer.daemon = True
+      timer.start()
+
+    if batch:
+      self.lookup_messages(batch)
+
+    return future.result()
+
+  def lookup_messages(self, batch=None):
+    batch = self.message_batcher.take() if batch is None else batch
+
+    if not batch:
+      return
+
+    try:
+      response = self.search_messages(ids=list(batch))
+    except Exception as error:
+      self.message_batcher.resolve(batch, error=error)
+    else:
+      self.message_batcher.resolve(batch, response)
 
   def get_message_rejections(self, params=None, **kwargs):
     return self.get(self.host, '/search/rejections', params or kwargs)
@@ -98,6 +897,12 @@ class Client():
   def search_messages(self, params=None, **kwargs):
     return self.get(self.host, '/search/messages', params or kwargs)
 
+  def iter_messages(self, params=None, prefetch=False, **kwargs):
+    return self.paginate(self.search_messages, params or kwargs, ('items',), prefetch=prefetch)
+
+  def iter_message_rejections(self, params=None, prefetch=False, **kwargs):
+    return self.paginate(self.get_message_rejections, params or kwargs, ('items',), prefetch=prefetch)
+
   def send_ussd_push_message(self, params=None, **kwargs):
     return self.post(self.host, '/ussd/json', params or kwargs)
 
@@ -147,6 +952,9 @@ class Client():
   def get_verification(self, request_id):
     return self.get(self.api_host, '/verify/search/json', {'request_id': request_id})
 
+  def get_verifications(self, request_ids):
+    return self.get(self.api_host, '/verify/search/json', {'request_ids': list(request_ids)})
+
   def get_verification_request(self, request_id):
     warnings.warn('nexmo.Client#get_verification_request is deprecated (use #get_verification instead)', DeprecationWarning, stacklevel=2)
 
@@ -164,17 +972,20 @@ class Client():
     return self.post(self.api_host, '/verify/control/json', params or kwargs)
 
   def get_basic_number_insight(self, params=None, **kwargs):
-    return self.get(self.api_host, '/number/format/json', params or kwargs)
+    return self.cached(self.insight_cache, self.get, self.api_host, '/number/format/json', params or kwargs)
 
   def get_number_insight(self, params=None, **kwargs):
-    return self.get(self.api_host, '/number/lookup/json', params or kwargs)
+    return self.cached(self.insight_cache, self.get, self.api_host, '/number/lookup/json', params or kwargs)
 
   def request_number_insight(self, params=None, **kwargs):
-    return self.post(self.host, '/ni/json', params or kwargs)
+    return self.cached(self.insight_cache, self.post, self.host, '/ni/json', params or kwargs)
 
   def get_applications(self, params=None, **kwargs):
     return self.get(self.api_host, '/v1/applications', params or kwargs)
 
+  def iter_applications(self, params=None, prefetch=False, **kwargs):
+    return self.paginate(self.get_applications, params or kwargs, ('_embedded', 'applications'), 'page_index', 'page_size', 0, prefetch=prefetch)
+
   def get_application(self, application_id):
     return self.get(self.api_host, '/v1/applications/' + application_id)
 
@@ -193,64 +1004,313 @@ class Client():
   def get_calls(self, params=None, **kwargs):
     return self.__get('/v1/calls', params or kwargs)
 
+  def iter_calls(self, params=None, prefetch=False, **kwargs):
+    return self.paginate(self.get_calls, params or kwargs, ('_embedded', 'calls'), 'record_index', 'page_size', 0, records=True, prefetch=prefetch)
+
   def get_call(self, uuid):
     return self.__get('/v1/calls/' + uuid)
 
   def update_call(self, uuid, params=None, **kwargs):
     return self.__put('/v1/calls/' + uuid, params or kwargs)
 
-  def check_signature(self, params):
+  def cached(self, cache, method, host, request_uri, params):
+    if cache is None and self.flights is None:
+      return method(host, request_uri, params)
+
+    key = self.cache_key(request_uri, params)
+
+    if key is None:
+      return method(host, request_uri, params)
+
+    value = Cache.missing if cache is None else cache.get(key, Cache.missing)
+
+    if value is Cache.missing:
+      if self.flights is None:
+        value = method(host, request_uri, params)
+      else:
+        value = self.flights.do(key, method, host, request_uri, params)
+
+      if cache is not None:
+        cache.set(key, value)
+
+    return copy.deepcopy(value)
+
+  def cache_key(self, request_uri, params):
+    key = (request_uri,) + tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in params.items()))
+
+    try:
+      hash(key)
+    except TypeError:
+      return None
+
+    return key
+
+  def paginate(self, method, params, key, index=None, size=None, start=0, records=False, prefetch=False):
+    if index is None:
+      for item in self.items(method(params), key):
+        yield item
+
+      return
+
     params = dict(params)
+    params.setdefault(size, 100)
+
+    position = int(params.pop(index, start))
+
+    fetch = lambda position: method(dict(params, **{index: position}))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if prefetch else None
 
-    signature = params.pop('sig', '')
+    try:
+      response, seen = fetch(position), 0
 
-    return hmac.compare_digest(signature, self.signature(params))
+      while True:
+        items = self.items(response, key)
+
+        seen += len(items)
+
+        position += len(items) if records else 1
+
+        more = self.more(response, items, seen, int(params[size]))
+
+        future = executor.submit(fetch, position) if more and executor else None
+
+        for item in items:
+          yield item
+
+        if not more:
+          return
+
+        response = future.result() if future else fetch(position)
+    finally:
+      if executor is not None:
+        executor.shutdown(wait=False)
+
+  def more(self, response, items, seen, size):
+    count = response.get('count')
+
+    if count is None:
+      return len(items) >= size
+
+    return len(items) > 0 and seen < int(count)
+
+  def items(self, response, key):
+    for name in key:
+      response = (response or {}).get(name)
+
+    return response or []
+
+  def check_signature(self, params):
+    return check_signature(self.signature_key(), self.signature_method, params)
+
+  def check_signatures(self, batch, processes=None, chunksize=256):
+    function = functools.partial(check_signature, self.signature_key(), self.signature_method)
+
+    if not processes:
+      return [function(params) for params in batch]
+
+    return list(self.signature_executor(processes).map(function, batch, chunksize=chunksize))
+
+  def signature_executor(self, processes):
+    with self.signature_lock:
+      if self.signature_pool is None or self.signature_pool[0] != processes:
+        if self.signature_pool is not None:
+          self.signature_pool[1].shutdown(wait=False)
+
+        self.signature_pool = (processes, concurrent.futures.ProcessPoolExecutor(max_workers=processes))
+
+      return self.signature_pool[1]
 
   def signature(self, params):
-    md5 = hashlib.md5()
+    return signature(self.signature_key(), self.signature_method, params)
 
-    for key in sorted(params):
-      md5.update('&{0}={1}'.format(key, params[key]).encode('utf-8'))
+  def signature_key(self):
+    secret = self.signature_secret
 
-    md5.update(self.signature_secret.encode('utf-8'))
+    if self.signature_secret_bytes is None or self.signature_secret_bytes[0] is not secret:
+      self.signature_secret_bytes = (secret, secret.encode('utf-8'))
 
-    return md5.hexdigest()
+    return self.signature_secret_bytes[1]
 
   def get(self, host, request_uri, params={}):
-    uri = 'https://' + host + request_uri
-
     params = dict(params, api_key=self.api_key, api_secret=self.api_secret)
 
-    return self.parse(host, requests.get(uri, params=params, headers=self.headers))
+    return self.request('GET', host, request_uri, params=params, headers=self.headers)
 
   def post(self, host, request_uri, params):
-    uri = 'https://' + host + request_uri
-
     params = dict(params, api_key=self.api_key, api_secret=self.api_secret)
 
-    return self.parse(host, requests.post(uri, data=params, headers=self.headers))
+    return self.request('POST', host, request_uri, data=params, headers=self.headers)
 
   def put(self, host, request_uri, params):
-    uri = 'https://' + host + request_uri
-
     params = dict(params, api_key=self.api_key, api_secret=self.api_secret)
 
-    return self.parse(host, requests.put(uri, data=params, headers=self.headers))
+    return self.request('PUT', host, request_uri, data=params, headers=self.headers)
 
   def delete(self, host, request_uri):
-    uri = 'https://' + host + request_uri
-
     params = dict(api_key=self.api_key, api_secret=self.api_secret)
 
-    return self.parse(host, requests.delete(uri, params=params, headers=self.headers))
+    return self.request('DELETE', host, request_uri, params=params, headers=self.headers)
+
+  def request(self, method, host, request_uri, **kwargs):
+    attempt = 1
+
+    deadline = None if self.deadline is None else monotonic() + self.deadline
+
+    send = self.__hedged if self.hedge is not None and self.hedge.allowed(method, request_uri) else self.__send
+
+    while True:
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.allow(host, self.emit)
+
+      try:
+        if self.rate_limiter is not None:
+          self.rate_limiter.acquire(host, request_uri)
+
+        timeout = self.attempt_timeout(host, deadline)
+
+        if timeout is not None:
+          kwargs['timeout'] = timeout
+
+        response = send(method, host, request_uri, attempt, kwargs)
+      except self.transport.errors:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True, self.emit)
+
+        if deadline is not None and monotonic() >= deadline:
+          raise DeadlineExceededError('deadline exceeded for {host}'.format(host=host))
+
+        if self.retry is None or not self.retry.should_retry(method, request_uri, attempt):
+          raise
+
+        self.backoff(host, self.retry.delay(attempt), deadline)
+
+        attempt += 1
+
+        continue
+      except BaseException:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.release(host)
+
+        raise
+
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.record(host, response.status_code >= 500, self.emit)
+
+      if self.rate_limiter is not None:
+        self.rate_limiter.update(host, request_uri, response.status_code)
+
+      if self.retry is None or not self.retry.should_retry(method, request_uri, attempt, response.status_code):
+        return self.parse(host, response, self.model(method, request_uri))
+
+      self.backoff(host, self.retry.delay(attempt, response), deadline)
+
+      attempt += 1
+
+  def attempt_timeout(self, host, deadline):
+    if deadline is None:
+      return self.timeout
+
+    remaining = deadline - monotonic()
+
+    if remaining <= 0:
+      raise DeadlineExceededError('deadline exceeded for {host}'.format(host=host))
+    elif self.timeout is None:
+      return remaining
+    elif isinstance(self.timeout, tuple):
+      return tuple(min(value, remaining) for value in self.timeout)
+    else:
+      return min(self.timeout, remaining)
+
+  def backoff(self, host, delay, deadline):
+    if deadline is not None and monotonic() + delay >= deadline:
+      raise DeadlineExceededError('deadline exceeded for {host}'.format(host=host))
+
+    time.sleep(delay)
+
+  def __hedged(self, method, host, request_uri, attempt, kwargs):
+    delay = self.hedge.delay(self.metrics.latency(method, self.endpoint(request_uri)))
+
+    if delay is None:
+      return self.__send(method, host, request_uri, attempt, kwargs)
+
+    pending = set([spawn(self.__send, method, host, request_uri, attempt, kwargs)])
+
+    done, _ = concurrent.futures.wait(pending, timeout=delay)
 
-  def parse(self, host, response):
+    if not done:
+      pending.add(self.hedge.executor().submit(self.__send, method, host, request_uri, attempt, kwargs))
+
+    error = None
+
+    while pending:
+      done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+      for future in done:
+        if future.exception() is None:
+          return future.result()
+
+        error = future.exception()
+
+    raise error
+
+  def __send(self, method, host, request_uri, attempt, kwargs):
+    event = self.event(method, host, request_uri, attempt)
+
+    start = monotonic()
+
+    try:
+      response = self.transport.request(method, host, self.base_uris.get(host, 'https://' + host) + request_uri, **kwargs)
+    except Exception as error:
+      self.record(event, start, error=error)
+
+      raise
+
+    bytes_sent, connect, ttfb = self.transport.measure(response)
+
+    self.record(event, start, response, bytes_sent, connect, ttfb)
+
+    return response
+
+  def endpoint(self, request_uri):
+    parts = request_uri.split('/')
+
+    return '/'.join(parts[:3] + [':id']) if parts[1] == 'v1' and len(parts) > 3 else request_uri
+
+  def event(self, method, host, request_uri, attempt):
+    event = {'method': method, 'host': host, 'endpoint': self.endpoint(request_uri), 'request_uri': request_uri, 'attempt': attempt}
+
+    self.emit('request', event)
+
+    return event
+
+  def record(self, event, start, response=None, bytes_sent=None, connect=None, ttfb=None, error=None):
+    event = dict(event, status=None if response is None else response.status_code, error=error)
+    event['bytes_sent'] = bytes_sent
+    event['bytes_received'] = None if response is None else len(response.content)
+    event['connect'] = connect
+    event['ttfb'] = ttfb
+    event['total'] = monotonic() - start
+
+    self.metrics.record(event)
+
+    self.emit('response', event)
+
+  def model(self, method, request_uri):
+    if self.typed_responses:
+      from nexmo import models
+
+      return models.model(method, request_uri)
+
+  def parse(self, host, response, model=None):
     if response.status_code == 401:
       raise AuthenticationError
     elif response.status_code == 204:
       return None
+    elif 200 <= response.status_code < 300 and model is not None:
+      return model(content=response.content, codec=self.codec)
     elif 200 <= response.status_code < 300:
-      return response.json()
+      return self.codec.loads(response.content)
     elif 400 <= response.status_code < 500:
       message = "{code} response from {host}".format(code=response.status_code, host=host)
 
@@ -261,29 +1321,91 @@ class Client():
       raise ServerError(message)
 
   def __get(self, request_uri, params={}):
-    uri = 'https://' + self.api_host + request_uri
-
-    return self.parse(self.api_host, requests.get(uri, params=params, headers=self.__headers()))
+    return self.request('GET', self.api_host, request_uri, params=params, headers=self.__headers())
 
   def __post(self, request_uri, params):
-    uri = 'https://' + self.api_host + request_uri
-
-    return self.parse(self.api_host, requests.post(uri, json=params, headers=self.__headers()))
+    return self.request('POST', self.api_host, request_uri, data=self.encode(params), headers=self.__headers(json=True))
 
   def __put(self, request_uri, params):
-    uri = 'https://' + self.api_host + request_uri
+    return self.request('PUT', self.api_host, request_uri, data=self.encode(params), headers=self.__headers(json=True))
+
+  def encode(self, params):
+    data = self.codec.dumps(params)
 
-    return self.parse(self.api_host, requests.put(uri, json=params, headers=self.__headers()))
+    return data if isinstance(data, bytes) else data.encode('utf-8')
 
-  def __headers(self):
-    iat = int(time.time())
+  def __headers(self, json=False):
+    headers = dict(self.headers, Authorization=b'Bearer ' + self.__token())
+
+    if json:
+      headers['Content-Type'] = 'application/json'
+
+    return headers
+
+  def __token(self):
+    now = time.time()
+
+    if self.token_per_request:
+      return self.__sign(now)[0]
+
+    signer = (self.application_id, self.private_key)
+
+    with self.token_lock:
+      if self.token is None or self.token_signer != signer or now >= self.token_expires - self.token_refresh_margin:
+        self.token, self.token_expires = self.__sign(now)
+
+        self.token_signer = signer
+
+      return self.token
+
+  def __sign(self, now):
+    import jwt, uuid
+
+    iat = int(now)
 
     payload = dict(self.auth_params)
     payload.setdefault('application_id', self.application_id)
     payload.setdefault('iat', iat)
-    payload.setdefault('exp', iat + 60)
+    payload.setdefault('exp', iat + self.token_ttl)
     payload.setdefault('jti', str(uuid.uuid4()))
 
-    token = jwt.encode(payload, self.private_key, algorithm='RS256')
+    token = jwt.encode(payload, self.__signing_key(), algorithm='RS256')
+
+    if not isinstance(token, bytes):
+      token = token.encode('utf-8')
+
+    return token, payload['exp']
+
+  def __signing_key(self):
+    private_key = self.private_key
+
+    if self.signing_key is None or self.signing_key[0] is not private_key:
+      from cryptography.hazmat.backends import default_backend
+      from cryptography.hazmat.primitives import serialization
+
+      pem = private_key if isinstance(private_key, bytes) else private_key.encode('utf-8')
+
+      self.signing_key = (private_key, serialization.load_pem_private_key(pem, password=None, backend=default_backend()))
+
+    return self.signing_key[1]
+
+
+from nexmo.transports import RequestsTransport, HTTP2Transport, MemoryTransport
+
+from nexmo.pool import ClientPool
+
+from nexmo.outbox import Outbox
+
+from nexmo.verify import VerifySessions
+
+
+if sys.version_info >= (3, 7):
+  def __getattr__(name):
+    if name == 'AsyncClient':
+      from nexmo.aio import AsyncClient
+
+      return AsyncClient
 
-    return dict(self.headers, Authorization=b'Bearer ' + token)
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+elif sys.version_info >= (3, 6):
+  from nexmo.aio import AsyncClient
@@ -0,0 +1,358 @@
+import asyncio, collections, copy
+
+from nexmo import Client, BulkResult, Cache, DeadlineExceededError, monotonic
+
+from nexmo.transports import ConnectTrace, httpx_measure, httpx_timeout
+
+
+class AsyncConnectTrace(ConnectTrace):
+  async def __call__(self, name, info):
+    ConnectTrace.__call__(self, name, info)
+
+
+class AsyncClient(Client):
+  def __init__(self, **kwargs):
+    kwargs.setdefault('pool_maxsize', 100)
+
+    Client.__init__(self, **kwargs)
+
+    self.transport = kwargs.get('transport', None)
+
+    self.http2 = kwargs.get('http2', False)
+
+    self.http = None
+
+    self.tasks = {}
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, exc_type, exc_value, traceback):
+    await self.close()
+
+  def session(self, host=None):
+    if self.http is None:
+      import httpx
+
+      limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+
+      self.http = httpx.AsyncClient(limits=limits, transport=self.transport, http2=self.http2, timeout=None)
+
+    return self.http
+
+  async def estimate_message(self, params):
+    from nexmo import sms
+
+    analysis = sms.analyse(params.get('text', ''), params.get('type'))
+
+    return analysis, float((await self.get_sms_pricing(params['to']))['price']) * analysis.segments
+
+  async def send_messages(self, messages, workers=10, ordered=False, template=None):
+    send = self.send_message if template is None else template.send
+
+    pending = collections.deque() if ordered else set()
+
+    try:
+      if hasattr(messages, '__aiter__'):
+        async for params in messages:
+          async for result in self.__enqueue(send, pending, params, workers, ordered):
+            yield result
+      else:
+        for params in messages:
+          async for result in self.__enqueue(send, pending, params, workers, ordered):
+            yield result
+
+      while pending:
+        for result in await self.__completed(pending, ordered):
+          yield result
+    finally:
+      for task in pending:
+        task.cancel()
+
+  async def __enqueue(self, send, pending, params, workers, ordered):
+    if len(pending) >= workers:
+      for result in await self.__completed(pending, ordered):
+        yield result
+
+    task = asyncio.ensure_future(self.__send_message(send, params))
+
+    if ordered:
+      pending.append(task)
+    else:
+      pending.add(task)
+
+  async def __send_message(self, send, params):
+    try:
+      return BulkResult(params, await send(params), None)
+    except Exception as error:
+      return BulkResult(params, None, error)
+
+  async def __completed(self, pending, ordered):
+    if ordered:
+      return [await pending.popleft()]
+
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+    pending.difference_update(done)
+
+    return [task.result() for task in done]
+
+  async def get_message(self, message_id):
+    if self.message_batcher is None:
+      return await Client.get_message(self, message_id)
+
+    loop = asyncio.get_event_loop()
+
+    future = loop.create_future()
+
+    batch, schedule = self.message_batcher.add(message_id, future)
+
+    if schedule:
+      loop.call_later(self.message_batcher.window, lambda: asyncio.ensure_future(self.lookup_messages()))
+
+    if batch:
+      asyncio.ensure_future(self.lookup_messages(batch))
+
+    return await future
+
+  async def lookup_messages(self, batch=None):
+    batch = self.message_batcher.take() if batch is None else batch
+
+    if not batch:
+      return
+
+    try:
+      response = await self.search_messages(ids=list(batch))
+    except Exception as error:
+      self.message_batcher.resolve(batch, error=error)
+    else:
+      self.message_batcher.resolve(batch, response)
+
+  async def cached(self, cache, method, host, request_uri, params):
+    if cache is None and self.flights is None:
+      return await method(host, request_uri, params)
+
+    key = self.cache_key(request_uri, params)
+
+    if key is None:
+      return await method(host, request_uri, params)
+
+    value = Cache.missing if cache is None else cache.get(key, Cache.missing)
+
+    if value is Cache.missing:
+      if self.flights is None:
+        value = await method(host, request_uri, params)
+      else:
+        value = await asyncio.shield(self.__flight(key, method, host, request_uri, params))
+
+      if cache is not None:
+        cache.set(key, value)
+
+    return copy.deepcopy(value)
+
+  def __flight(self, key, method, host, request_uri, params):
+    task = self.tasks.get(key)
+
+    if task is None:
+      task = asyncio.ensure_future(method(host, request_uri, params))
+      task.add_done_callback(lambda task: self.tasks.pop(key, None))
+
+      self.tasks[key] = task
+
+    return task
+
+  async def paginate(self, method, params, key, index=None, size=None, start=0, records=False, prefetch=False):
+    if index is None:
+      for item in self.items(await method(params), key):
+        yield item
+
+      return
+
+    params = dict(params)
+    params.setdefault(size, 100)
+
+    position = int(params.pop(index, start))
+
+    fetch = lambda position: asyncio.ensure_future(method(dict(params, **{index: position})))
+
+    response, seen, task = await fetch(position), 0, None
+
+    try:
+      while True:
+        items = self.items(response, key)
+
+        seen += len(items)
+
+        position += len(items) if records else 1
+
+        more = self.more(response, items, seen, int(params[size]))
+
+        task = fetch(position) if more and prefetch else None
+
+        for item in items:
+          yield item
+
+        if not more:
+          return
+
+        response = await (task or fetch(position))
+    finally:
+      if task is not None:
+        task.cancel()
+
+  async def close(self):
+    http, self.http = self.http, None
+
+    if http is not None:
+      await http.aclose()
+
+  async def request(self, method, host, request_uri, **kwargs):
+    import httpx
+
+    attempt = 1
+
+    deadline = None if self.deadline is None else monotonic() + self.deadline
+
+    send = self.__hedged if self.hedge is not None and self.hedge.allowed(method, request_uri) else self.__send
+
+    while True:
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.allow(host, self.emit)
+
+      try:
+        if self.rate_limiter is not None:
+          await asyncio.sleep(self.rate_limiter.reserve(host, request_uri))
+
+        timeout = self.attempt_timeout(host, deadline)
+
+        if timeout is not None:
+          kwargs['timeout'] = httpx_timeout(timeout)
+
+        response = await send(method, host, request_uri, attempt, kwargs)
+      except httpx.TransportError:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.record(host, True, self.emit)
+
+        if deadline is not None and monotonic() >= deadline:
+          raise DeadlineExceededError('deadline exceeded for {host}'.format(host=host))
+
+        if self.retry is None or not self.retry.should_retry(method, request_uri, attempt):
+          raise
+
+        await self.backoff(host, self.retry.delay(attempt), deadline)
+
+        attempt += 1
+
+        continue
+      except BaseException:
+        if self.circuit_breaker is not None:
+          self.circuit_breaker.release(host)
+
+        raise
+
+      if self.circuit_breaker is not None:
+        self.circuit_breaker.record(host, response.status_code >= 500, self.emit)
+
+      if self.rate_limiter is not None:
+        self.rate_limiter.update(host, request_uri, response.status_code)
+
+      if self.retry is None or not self.retry.should_retry(method, request_uri, attempt, response.status_code):
+        return self.parse(host, response, self.model(method, request_uri))
+
+      await self.backoff(host, self.retry.delay(attempt, response), deadline)
+
+      attempt += 1
+
+  async def backoff(self, host, delay, deadline):
+    if deadline is not None and monotonic() + delay >= deadline:
+      raise DeadlineExceededError('deadline exceeded for {host}'.format(host=host))
+
+    await asyncio.sleep(delay)
+
+  async def __hedged(self, method, host, request_uri, attempt, kwargs):
+    delay = self.hedge.delay(self.metrics.latency(method, self.endpoint(request_uri)))
+
+    if delay is None:
+      return await self.__send(method, host, request_uri, attempt, kwargs)
+
+    pending = set([asyncio.ensure_future(self.__send(method, host, request_uri, attempt, kwargs))])
+
+    try:
+      done, _ = await asyncio.wait(pending, timeout=delay)
+
+      if not done:
+        pending.add(asyncio.ensure_future(self.__send(method, host, request_uri, attempt, kwargs)))
+
+      error = None
+
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        for task in done:
+          if task.exception() is None:
+            return task.result()
+
+          error = task.exception()
+
+      raise error
+    finally:
+      for task in pending:
+        task.cancel()
+
+  async def __send(self, method, host, request_uri, attempt, kwargs):
+    event = self.event(method, host, request_uri, attempt)
+
+    if isinstance(kwargs.get('data'), bytes):
+      kwargs = dict(kwargs)
+      kwargs['content'] = kwargs.pop('data')
+
+    start = monotonic()
+
+    try:
+      response = await self.session(host).request(method, self.base_uris.get(host, 'https://' + host) + request_uri, extensions={'trace': AsyncConnectTrace()}, **kwargs)
+    except Exception as error:
+      self.record(event, start, error=error)
+
+      raise
+
+    self.record(event, start, response, *httpx_measure(response))
+
+    return response
+
+
+def asgi(app):
+  async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+      while True:
+        message = await receive()
+
+        if message['type'] == 'lifespan.startup':
+          app.start()
+
+          await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+          app.stop(wait=False)
+
+          await send({'type': 'lifespan.shutdown.complete'})
+
+          return
+
+    body, more = b'', True
+
+    while more:
+      message = await receive()
+
+      body += message.get('body', b'')
+
+      more = message.get('more_body', False)
+
+    headers = dict(scope.get('headers', []))
+
+    content_type = headers.get(b'content-type', b'').decode('latin-1')
+
+    status = app.handle(scope['path'], scope.get('query_string', b'').decode('latin-1'), content_type, body, timeout=0)
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain'), (b'content-length', b'0')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+  return application
@@ -0,0 +1,154 @@
+try:
+  from collections.abc import Mapping
+except ImportError:
+  from collections import Mapping
+
+
+class Record(object):
+  __slots__ = ('_content', '_codec', '_extra')
+
+  __hash__ = None
+
+  fields = ()
+
+  nested = {}
+
+  def __init__(self, data=None, content=None, codec=None):
+    self._content = content
+
+    self._codec = codec
+
+    self._extra = None
+
+    if data is not None:
+      self._assign(data)
+
+  def _load(self):
+    content, codec = self._content, self._codec
+
+    if content is not None and codec is not None:
+      self._assign(codec.loads(content))
+
+      self._content = self._codec = None
+
+  def _assign(self, data):
+    attributes, extra = self.attributes, None
+
+    for key, value in data.items():
+      if key in self.nested:
+        value = [self.nested[key](item) for item in value] if isinstance(value, list) else self.nested[key](value)
+
+      if key in attributes:
+        object.__setattr__(self, attributes[key], value)
+      else:
+        if extra is None:
+          extra = {}
+
+        extra[key] = value
+
+    self._extra = extra
+
+  def __getattr__(self, name):
+    if name.startswith('_'):
+      raise AttributeError(name)
+
+    if self._content is not None:
+      self._load()
+
+      return getattr(self, name)
+
+    if name in self.keys_by_attribute:
+      return None
+
+    raise AttributeError(name)
+
+  def __getitem__(self, key):
+    self._load()
+
+    attribute = self.attributes.get(key)
+
+    if attribute is None:
+      if self._extra is None or key not in self._extra:
+        raise KeyError(key)
+
+      return self._extra[key]
+
+    try:
+      return object.__getattribute__(self, attribute)
+    except AttributeError:
+      raise KeyError(key)
+
+  def __iter__(self):
+    self._load()
+
+    for key, attribute in self.fields:
+      try:
+        object.__getattribute__(self, attribute)
+      except AttributeError:
+        continue
+
+      yield key
+
+    for key in self._extra or ():
+      yield key
+
+  def __len__(self):
+    return sum(1 for key in self)
+
+  def __reduce__(self):
+    return (type(self), (dict(self.items()),))
+
+  def __repr__(self):
+    return '{0}({1!r})'.format(type(self).__name__, dict(self.items()))
+
+
+for name in ('__contains__', 'keys', 'items', 'values', 'get', '__eq__', '__ne__'):
+  if name in Mapping.__dict__:
+    setattr(Record, name, Mapping.__dict__[name])
+
+Mapping.register(Record)
+
+
+def attribute(key):
+  return {'from': 'from_', '_links': 'links'}.get(key, key.replace('-', '_'))
+
+
+def record(name, fields, nested=None):
+  fields = tuple((key, attribute(key)) for key in fields)
+
+  namespace = {
+    '__module__': __name__,
+    '__slots__': tuple(slot for key, slot in fields),
+    'fields': fields,
+    'attributes': dict(fields),
+    'keys_by_attribute': dict((slot, key) for key, slot in fields),
+    'nested': nested or {}
+  }
+
+  return type(name, (Record,), namespace)
+
+
+Message = record('Message', ['to', 'message-id', 'status', 'remaining-balance', 'message-price', 'network', 'error-text', 'client-ref'])
+
+MessageResponse = record('MessageResponse', ['message-count', 'messages'], {'messages': Message})
+
+Check = record('Check', ['date_received', 'code', 'status', 'ip_address'])
+
+Verification = record('Verification', [
+  'request_id', 'account_id', 'number', 'sender_id', 'date_submitted', 'date_finalized', 'first_event_date',
+  'last_event_date', 'price', 'currency', 'status', 'checks', 'error_text'
+], {'checks': Check})
+
+Call = record('Call', [
+  'uuid', 'conversation_uuid', 'to', 'from', 'status', 'direction', 'rate', 'price', 'duration',
+  'start_time', 'end_time', 'network', '_links'
+])
+
+
+def model(method, request_uri):
+  if request_uri == '/sms/json':
+    return MessageResponse
+  elif request_uri == '/verify/search/json':
+    return Verification
+  elif request_uri.startswith('/v1/calls/') or (request_uri == '/v1/calls' and method == 'POST'):
+    return Call
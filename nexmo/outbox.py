@@ -0,0 +1,213 @@
+import collections, hashlib, json, os, threading
+
+from nexmo import ClientError
+
+
+class SQLiteJournal(object):
+  def __init__(self, path):
+    import sqlite3
+
+    self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    self.lock = threading.Lock()
+
+    with self.lock, self.connection:
+      self.connection.execute('CREATE TABLE IF NOT EXISTS outbox (key TEXT PRIMARY KEY, params TEXT, state TEXT, message_ids TEXT, error TEXT)')
+
+  def load(self):
+    with self.lock:
+      rows = self.connection.execute('SELECT key, params, state, message_ids, error FROM outbox ORDER BY rowid').fetchall()
+
+    return [entry(key, state, json.loads(params), message_ids and json.loads(message_ids), error) for key, params, state, message_ids, error in rows]
+
+  def write(self, entries):
+    with self.lock, self.connection:
+      for item in entries:
+        if item['params'] is not None:
+          self.connection.execute('INSERT OR IGNORE INTO outbox (key, params, state) VALUES (?, ?, ?)', (item['key'], json.dumps(item['params']), item['state']))
+        else:
+          message_ids = None if item['message_ids'] is None else json.dumps(item['message_ids'])
+
+          self.connection.execute('UPDATE outbox SET state = ?, message_ids = ?, error = ? WHERE key = ?', (item['state'], message_ids, item['error'], item['key']))
+
+  def close(self):
+    self.connection.close()
+
+
+class FileJournal(object):
+  def __init__(self, path):
+    self.path = path
+
+    self.file = open(path, 'a')
+
+    self.lock = threading.Lock()
+
+  def load(self):
+    entries = collections.OrderedDict()
+
+    with open(self.path) as fd:
+      for line in fd:
+        try:
+          item = json.loads(line)
+        except ValueError:
+          continue
+
+        if item['key'] in entries:
+          entries[item['key']].update(item, params=entries[item['key']]['params'])
+        else:
+          entries[item['key']] = item
+
+    return list(entries.values())
+
+  def write(self, entries):
+    lines = ''.join(json.dumps(item, sort_keys=True) + '\n' for item in entries)
+
+    with self.lock:
+      self.file.write(lines)
+      self.file.flush()
+
+      os.fsync(self.file.fileno())
+
+  def close(self):
+    self.file.close()
+
+
+def entry(key, state, params=None, message_ids=None, error=None):
+  return {'key': key, 'state': state, 'params': params, 'message_ids': message_ids, 'error': error}
+
+
+def idempotency_key(params):
+  return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Outbox(object):
+  retryable = frozenset(['1'])
+
+  def __init__(self, client, journal, batch_size=100, workers=10):
+    self.client = client
+
+    self.journal = SQLiteJournal(journal) if isinstance(journal, str) else journal
+
+    self.batch_size = batch_size
+
+    self.workers = workers
+
+    self.buffer = []
+
+    self.entries = collections.OrderedDict((item['key'], item) for item in self.journal.load())
+
+    self.lock = threading.Lock()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def add(self, params, key=None):
+    key = key or idempotency_key(params)
+
+    with self.lock:
+      if key in self.entries:
+        return key
+
+      params = dict(params)
+      params.setdefault('client-ref', key)
+
+      item = self.entries[key] = entry(key, 'pending', params)
+
+      self.buffer.append(item)
+
+      if len(self.buffer) >= self.batch_size:
+        self.flush_locked()
+
+    return key
+
+  def flush(self):
+    with self.lock:
+      self.flush_locked()
+
+  def flush_locked(self):
+    if self.buffer:
+      buffer, self.buffer = self.buffer, []
+
+      self.journal.write(buffer)
+
+  def state(self, key):
+    item = self.entries.get(key)
+
+    return None if item is None else item['state']
+
+  def pending(self):
+    return [item for item in self.entries.values() if item['state'] == 'pending']
+
+  def in_doubt(self):
+    return [item for item in self.entries.values() if item['state'] == 'submitted']
+
+  def requeue(self, *keys):
+    with self.lock:
+      self.flush_locked()
+
+      self.update([self.entries[key] for key in keys], 'pending')
+
+  def update(self, items, state):
+    entries = []
+
+    for item in items:
+      item.update(state=state, message_ids=None, error=None)
+
+      entries.append(entry(item['key'], state))
+
+    self.journal.write(entries)
+
+  def send(self):
+    self.flush()
+
+    items = self.pending()
+
+    for start in range(0, len(items), self.batch_size):
+      batch = items[start:start + self.batch_size]
+
+      with self.lock:
+        self.update(batch, 'submitted')
+
+      keys = dict((id(item['params']), item) for item in batch)
+
+      results = list(self.client.send_messages((item['params'] for item in batch), workers=self.workers))
+
+      entries = []
+
+      for result in results:
+        item = keys[id(result.params)]
+
+        if result.error is not None:
+          if not isinstance(result.error, ClientError):
+            continue
+
+          item.update(state='failed', error=str(result.error) or type(result.error).__name__)
+        else:
+          messages = list(result.response.get('messages', []))
+
+          message_ids = [message.get('message-id') for message in messages]
+
+          failures = [message for message in messages if message.get('status') != '0']
+
+          if not failures:
+            item.update(state='sent', message_ids=message_ids)
+          elif len(failures) == len(messages) and all(message.get('status') in self.retryable for message in failures):
+            item.update(state='pending')
+          else:
+            item.update(state='failed', message_ids=message_ids, error=failures[0].get('error-text') or 'status {0}'.format(failures[0].get('status')))
+
+        entries.append(entry(item['key'], item['state'], message_ids=item['message_ids'], error=item['error']))
+
+      with self.lock:
+        self.journal.write(entries)
+
+      for result in results:
+        yield result
+
+  def close(self):
+    self.flush()
+
+    self.journal.close()
@@ -0,0 +1,167 @@
+import functools, itertools, threading, zlib
+
+from nexmo import Client, RateLimiter, ServerError, AuthenticationError, bulk, monotonic
+
+
+class Member(object):
+  def __init__(self, client):
+    self.client = client
+
+    self.in_flight = 0
+
+    self.requests = 0
+
+    self.errors = 0
+
+    self.failures = 0
+
+    self.unhealthy_until = 0
+
+  def healthy(self, now):
+    return now >= self.unhealthy_until
+
+  def snapshot(self, now):
+    return {
+      'key': self.client.api_key or self.client.application_id,
+      'healthy': self.healthy(now),
+      'in_flight': self.in_flight,
+      'requests': self.requests,
+      'errors': self.errors,
+      'failures': self.failures
+    }
+
+
+class RoundRobin(object):
+  def __init__(self):
+    self.counter = itertools.count()
+
+  def choose(self, members, name, args, kwargs):
+    return members[next(self.counter) % len(members)]
+
+
+class LeastLoaded(object):
+  def choose(self, members, name, args, kwargs):
+    return min(members, key=lambda member: (member.in_flight, member.requests))
+
+
+class Sticky(object):
+  def __init__(self, field='from'):
+    self.field = field
+
+  def key(self, args, kwargs):
+    if self.field in kwargs:
+      return kwargs[self.field]
+
+    for arg in args:
+      if isinstance(arg, dict) and self.field in arg:
+        return arg[self.field]
+
+  def choose(self, members, name, args, kwargs):
+    key = self.key(args, kwargs)
+
+    if key is None:
+      return members[0]
+
+    key = str(key).encode('utf-8')
+
+    return max(members, key=lambda member: zlib.crc32(key + b':' + (member.client.api_key or member.client.application_id or '').encode('utf-8')))
+
+
+strategies = {'round_robin': RoundRobin, 'least_loaded': LeastLoaded, 'sticky': Sticky}
+
+
+class ClientPool(object):
+  def __init__(self, credentials=None, clients=None, strategy='round_robin', failure_threshold=3, cooldown=30, rates=None, **kwargs):
+    clients = list(clients or [])
+
+    for credential in credentials or []:
+      options = dict(kwargs, **credential)
+
+      if rates is not None:
+        options['rate_limiter'] = RateLimiter(rates)
+
+      clients.append(Client(**options))
+
+    if not clients:
+      raise ValueError('ClientPool requires at least one set of credentials')
+
+    self.members = [Member(client) for client in clients]
+
+    self.strategy = strategies[strategy]() if isinstance(strategy, str) else strategy
+
+    self.failure_threshold = failure_threshold
+
+    self.cooldown = cooldown
+
+    self.lock = threading.Lock()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def __getattr__(self, name):
+    if name.startswith('_') or not callable(getattr(Client, name, None)):
+      raise AttributeError(name)
+
+    return functools.partial(self.call, name)
+
+  @property
+  def clients(self):
+    return [member.client for member in self.members]
+
+  def choose(self, name, args, kwargs):
+    now = monotonic()
+
+    with self.lock:
+      members = [member for member in self.members if member.healthy(now)] or self.members
+
+      member = self.strategy.choose(members, name, args, kwargs)
+
+      member.in_flight += 1
+
+      member.requests += 1
+
+    return member
+
+  def call(self, name, *args, **kwargs):
+    member = self.choose(name, args, kwargs)
+
+    try:
+      result = getattr(member.client, name)(*args, **kwargs)
+    except Exception as error:
+      self.release(member, failed=isinstance(error, (ServerError, AuthenticationError) + tuple(member.client.transport.errors)))
+
+      raise
+
+    self.release(member, failed=False, succeeded=True)
+
+    return result
+
+  def release(self, member, failed, succeeded=False):
+    with self.lock:
+      member.in_flight -= 1
+
+      if failed:
+        member.errors += 1
+
+        member.failures += 1
+
+        if member.failures >= self.failure_threshold:
+          member.unhealthy_until = monotonic() + self.cooldown
+      elif succeeded:
+        member.failures = 0
+
+  def send_messages(self, messages, workers=10, ordered=False):
+    return bulk(self.send_message, messages, workers, ordered)
+
+  def health(self):
+    now = monotonic()
+
+    with self.lock:
+      return [member.snapshot(now) for member in self.members]
+
+  def close(self):
+    for member in self.members:
+      member.client.close()
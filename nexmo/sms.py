@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+import collections, re
+
+
+GSM_BASIC = (
+  u'@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?'
+  u'¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà'
+)
+
+GSM_EXTENSION = u'\f^{}\\[~]|€'
+
+NOT_GSM = re.compile(u'[^' + re.escape(GSM_BASIC + GSM_EXTENSION) + u']')
+
+EXTENSION = re.compile(u'[' + re.escape(GSM_EXTENSION) + u']')
+
+NARROW = len(u'\U0001F600') == 2
+
+ASTRAL = re.compile(u'[\ud800-\udbff]' if NARROW else u'[\U00010000-\U0010FFFF]')
+
+LIMITS = {'gsm': (160, 153), 'ucs2': (70, 67)}
+
+UDH_BYTES = 6
+
+
+Analysis = collections.namedtuple('Analysis', ['encoding', 'length', 'segments', 'udh'])
+
+
+def analyse(text, type=None):
+  if type != 'unicode' and NOT_GSM.search(text) is None:
+    encoding, wide = 'gsm', EXTENSION
+  else:
+    encoding, wide = 'ucs2', ASTRAL
+
+  single, multi = LIMITS[encoding]
+
+  extra = len(wide.findall(text))
+
+  length = len(text) if encoding == 'ucs2' and NARROW else len(text) + extra
+
+  if length <= single:
+    segments = 1
+  elif extra == 0:
+    segments = -(-length // multi)
+  else:
+    segments = count_segments(text, wide, multi)
+
+  return Analysis(encoding, length, segments, UDH_BYTES * segments if segments > 1 else 0)
+
+
+def count_segments(text, wide, multi):
+  segments, used = 1, 0
+
+  for character in text:
+    if NARROW and u'\udc00' <= character <= u'\udfff':
+      continue
+
+    size = 2 if wide.match(character) else 1
+
+    if used + size > multi:
+      segments, used = segments + 1, 0
+
+    used += size
+
+  return segments
+
+
+def analyse_many(texts, type=None):
+  cache = {}
+
+  for text in texts:
+    analysis = cache.get(text)
+
+    if analysis is None:
+      analysis = analyse(text, type)
+
+      if len(cache) < 10000:
+        cache[text] = analysis
+
+    yield analysis
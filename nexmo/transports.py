@@ -0,0 +1,194 @@
+try:
+  from urllib.parse import urlencode
+except ImportError:
+  from urllib import urlencode
+
+import json, threading
+
+import requests
+
+from nexmo import monotonic
+
+
+class RequestsTransport(object):
+  errors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+  def __init__(self, pool_connections=1, pool_maxsize=10, pool_block=False):
+    self.pool_connections = pool_connections
+
+    self.pool_maxsize = pool_maxsize
+
+    self.pool_block = pool_block
+
+    self.sessions = {}
+
+    self.lock = threading.Lock()
+
+  def session(self, host):
+    session = self.sessions.get(host)
+
+    if session is None:
+      with self.lock:
+        session = self.sessions.get(host)
+
+        if session is None:
+          adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+
+          session = requests.Session()
+          session.mount('https://', adapter)
+          session.mount('http://', adapter)
+
+          self.sessions[host] = session
+
+    return session
+
+  def request(self, method, host, url, **kwargs):
+    return self.session(host).request(method, url, **kwargs)
+
+  def measure(self, response):
+    return len(response.request.body or b''), None, response.elapsed.total_seconds()
+
+  def close(self):
+    with self.lock:
+      sessions, self.sessions = self.sessions, {}
+
+    for session in sessions.values():
+      session.close()
+
+
+class HTTP2Transport(object):
+  def __init__(self, **options):
+    self.options = options
+
+    self.http = None
+
+    self.lock = threading.Lock()
+
+  @property
+  def errors(self):
+    import httpx
+
+    return (httpx.TransportError,)
+
+  def session(self, host=None):
+    if self.http is None:
+      with self.lock:
+        if self.http is None:
+          import httpx
+
+          self.http = httpx.Client(**dict({'http2': True, 'timeout': None}, **self.options))
+
+    return self.http
+
+  def request(self, method, host, url, params=None, data=None, headers=None, timeout=None):
+    options = {'params': params, 'headers': headers}
+
+    options['content' if isinstance(data, bytes) else 'data'] = data
+
+    if timeout is not None:
+      options['timeout'] = httpx_timeout(timeout)
+
+    return self.session(host).request(method, url, extensions={'trace': ConnectTrace()}, **options)
+
+  def measure(self, response):
+    return httpx_measure(response)
+
+  def close(self):
+    with self.lock:
+      http, self.http = self.http, None
+
+    if http is not None:
+      http.close()
+
+
+class ConnectTrace(object):
+  def __init__(self):
+    self.started = None
+
+    self.connect = 0.0
+
+  def __call__(self, name, info):
+    if name == 'connection.connect_tcp.started':
+      self.started = monotonic()
+    elif name in ('connection.connect_tcp.complete', 'connection.start_tls.complete') and self.started is not None:
+      self.connect = monotonic() - self.started
+
+
+def httpx_measure(response):
+  trace = response.request.extensions.get('trace')
+
+  try:
+    ttfb = response.elapsed.total_seconds()
+  except RuntimeError:
+    ttfb = None
+
+  return len(response.request.content), getattr(trace, 'connect', None), ttfb
+
+
+def httpx_timeout(timeout):
+  import httpx
+
+  if isinstance(timeout, tuple):
+    connect, read = timeout
+
+    return httpx.Timeout(read, connect=connect)
+
+  return timeout
+
+
+class MemoryRequest(object):
+  __slots__ = ('method', 'url', 'body', 'headers')
+
+  def __init__(self, method, url, body, headers):
+    self.method = method
+
+    self.url = url
+
+    self.body = body
+
+    self.headers = headers
+
+
+class MemoryResponse(object):
+  __slots__ = ('status_code', 'headers', 'content', 'request')
+
+  def __init__(self, status_code, headers, content, request):
+    self.status_code = status_code
+
+    self.headers = requests.structures.CaseInsensitiveDict(headers)
+
+    self.content = content
+
+    self.request = request
+
+
+class MemoryTransport(object):
+  errors = ()
+
+  def __init__(self, handler=None):
+    self.handler = handler or (lambda request: (200, {}, {}))
+
+  def request(self, method, host, url, params=None, data=None, headers=None, timeout=None):
+    if params:
+      url += '?' + urlencode(params, doseq=True)
+
+    if isinstance(data, dict):
+      data = urlencode(data, doseq=True).encode('utf-8')
+
+    request = MemoryRequest(method, url, data, dict(headers or {}))
+
+    status_code, headers, content = self.handler(request)
+
+    if isinstance(content, (dict, list)):
+      content = json.dumps(content)
+
+    if not isinstance(content, bytes):
+      content = content.encode('utf-8')
+
+    return MemoryResponse(status_code, headers, content, request)
+
+  def measure(self, response):
+    return len(response.request.body or b''), 0.0, 0.0
+
+  def close(self):
+    pass
@@ -0,0 +1,198 @@
+import heapq, itertools, logging, threading
+
+import concurrent.futures
+
+from nexmo import ClientError, VerificationExpiredError, monotonic
+
+
+logger = logging.getLogger('nexmo.verify')
+
+
+class Session(object):
+  __slots__ = ('request_id', 'future', 'expires')
+
+  def __init__(self, request_id, expires):
+    self.request_id = request_id
+
+    self.future = concurrent.futures.Future()
+
+    self.expires = expires
+
+
+class VerifySessions(object):
+  def __init__(self, client, interval=5, expiry=300, next_event=None, batch_size=10):
+    self.client = client
+
+    self.interval = interval
+
+    self.expiry = expiry
+
+    self.next_event = next_event
+
+    self.batch_size = batch_size
+
+    self.sessions = {}
+
+    self.heap = []
+
+    self.counter = itertools.count()
+
+    self.condition = threading.Condition()
+
+    self.thread = None
+
+    self.running = False
+
+  def __len__(self):
+    return len(self.sessions)
+
+  def start(self):
+    with self.condition:
+      if self.thread is None:
+        self.running = True
+
+        self.thread = threading.Thread(target=self.run, name='nexmo-verify')
+        self.thread.daemon = True
+        self.thread.start()
+
+  def stop(self, wait=True):
+    with self.condition:
+      thread, self.thread, self.running = self.thread, None, False
+
+      self.condition.notify()
+
+    if wait and thread is not None:
+      thread.join()
+
+  def start_verification(self, params=None, **kwargs):
+    response = self.client.start_verification(params or kwargs)
+
+    if response.get('status') != '0':
+      future = concurrent.futures.Future()
+      future.set_exception(ClientError(response.get('error_text') or 'verification not started'))
+
+      return future
+
+    return self.track(response['request_id'])
+
+  def track(self, request_id, now=None):
+    now = monotonic() if now is None else now
+
+    with self.condition:
+      session = self.sessions.get(request_id)
+
+      if session is None:
+        session = self.sessions[request_id] = Session(request_id, now + self.expiry)
+
+        self.schedule(now + self.interval, 'poll', request_id)
+
+        if self.next_event is not None:
+          self.schedule(now + self.next_event, 'next_event', request_id)
+
+        self.schedule(session.expires, 'poll', request_id)
+
+        self.condition.notify()
+
+      return session.future
+
+  def check(self, request_id, code):
+    response = self.client.check_verification(request_id, code=code)
+
+    if response.get('status') == '0':
+      self.complete(request_id, result=dict(response, request_id=request_id, status='SUCCESS'))
+
+    return response
+
+  def cancel(self, request_id):
+    response = self.client.cancel_verification(request_id)
+
+    session = self.remove(request_id)
+
+    if session is not None:
+      session.future.cancel()
+
+    return response
+
+  def schedule(self, when, kind, request_id):
+    heapq.heappush(self.heap, (when, next(self.counter), kind, request_id))
+
+  def remove(self, request_id):
+    with self.condition:
+      return self.sessions.pop(request_id, None)
+
+  def complete(self, request_id, result=None, error=None):
+    session = self.remove(request_id)
+
+    if session is None or session.future.done():
+      return
+    elif error is not None:
+      session.future.set_exception(error)
+    else:
+      session.future.set_result(result)
+
+  def run(self):
+    while True:
+      with self.condition:
+        while self.running and (not self.heap or self.heap[0][0] > monotonic()):
+          self.condition.wait(None if not self.heap else self.heap[0][0] - monotonic())
+
+        if not self.running:
+          return
+
+      self.run_pending()
+
+  def run_pending(self, now=None):
+    now = monotonic() if now is None else now
+
+    polls, triggers = [], []
+
+    with self.condition:
+      while self.heap and self.heap[0][0] <= now:
+        when, _, kind, request_id = heapq.heappop(self.heap)
+
+        if request_id not in self.sessions:
+          continue
+        elif kind == 'next_event':
+          triggers.append(request_id)
+        elif request_id not in polls:
+          polls.append(request_id)
+
+    for request_id in triggers:
+      try:
+        self.client.trigger_next_verification_event(request_id)
+      except Exception:
+        logger.exception('Error triggering next event for %s', request_id)
+
+    for start in range(0, len(polls), self.batch_size):
+      self.lookup(polls[start:start + self.batch_size], now)
+
+  def lookup(self, request_ids, now):
+    try:
+      response = self.client.get_verifications(request_ids)
+    except Exception as error:
+      logger.exception('Error looking up verifications')
+
+      verifications, missing = {}, error
+    else:
+      verifications = dict((item.get('request_id'), item) for item in response.get('verification_requests', [response]))
+
+      missing = None
+
+    for request_id in request_ids:
+      with self.condition:
+        session = self.sessions.get(request_id)
+
+      if session is None:
+        continue
+
+      verification = verifications.get(request_id)
+
+      if verification is not None and verification.get('status') != 'IN PROGRESS':
+        self.complete(request_id, result=verification)
+      elif now >= session.expires and verification is not None:
+        self.complete(request_id, error=VerificationExpiredError('verification {0} still in progress after {1} seconds'.format(request_id, self.expiry), verification))
+      elif now >= session.expires:
+        self.complete(request_id, error=missing or ClientError('verification {0} not found'.format(request_id)))
+      else:
+        with self.condition:
+          self.schedule(now + self.interval, 'poll', request_id)
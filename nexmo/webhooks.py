@@ -0,0 +1,161 @@
+import json, logging, threading
+
+try:
+  from queue import Queue, Full
+except ImportError:
+  from Queue import Queue, Full
+
+try:
+  from urllib.parse import parse_qsl
+except ImportError:
+  from urlparse import parse_qsl
+
+
+logger = logging.getLogger('nexmo.webhooks')
+
+
+class Event(object):
+  def __init__(self, type, params, path='/'):
+    self.type = type
+
+    self.params = params
+
+    self.path = path
+
+  def __repr__(self):
+    return 'Event({0!r}, {1!r}, {2!r})'.format(self.type, self.params, self.path)
+
+
+class WebhookApp(object):
+  statuses = {200: '200 OK', 400: '400 Bad Request', 401: '401 Unauthorized', 503: '503 Service Unavailable'}
+
+  def __init__(self, client=None, verify=None, workers=4, queue_size=1000, timeout=1.0):
+    self.client = client
+
+    self.verify = (client is not None and client.signature_secret is not None) if verify is None else verify
+
+    if self.verify and client is None:
+      raise ValueError('WebhookApp requires a client to verify signatures')
+
+    self.workers = workers
+
+    self.timeout = timeout
+
+    self.queue = Queue(maxsize=queue_size)
+
+    self.handlers = {}
+
+    self.threads = []
+
+    self.lock = threading.Lock()
+
+  def on(self, type, handler=None):
+    if handler is None:
+      return lambda handler: self.on(type, handler)
+
+    self.handlers.setdefault(type, []).append(handler)
+
+    return handler
+
+  def start(self):
+    with self.lock:
+      while len(self.threads) < self.workers:
+        thread = threading.Thread(target=self.work, name='nexmo-webhooks-{0}'.format(len(self.threads)))
+        thread.daemon = True
+        thread.start()
+
+        self.threads.append(thread)
+
+  def stop(self, wait=True):
+    with self.lock:
+      threads, self.threads = self.threads, []
+
+    for thread in threads:
+      self.queue.put(None)
+
+    if wait:
+      for thread in threads:
+        thread.join()
+
+  def work(self):
+    while True:
+      event = self.queue.get()
+
+      try:
+        if event is None:
+          return
+
+        self.dispatch(event)
+      finally:
+        self.queue.task_done()
+
+  def dispatch(self, event):
+    for handler in self.handlers.get(event.type, []) + self.handlers.get('*', []):
+      try:
+        handler(event)
+      except Exception:
+        logger.exception('Error handling %r', event)
+
+  def parse(self, query, content_type, body):
+    params = dict(parse_qsl(query))
+
+    if body and content_type.startswith('application/json'):
+      data = self.client.codec.loads(body) if self.client is not None else json.loads(body.decode('utf-8'))
+
+      if not isinstance(data, dict):
+        raise ValueError('expected a JSON object')
+
+      params.update(data)
+    elif body:
+      params.update(parse_qsl(body.decode('utf-8')))
+
+    return params
+
+  def classify(self, params):
+    if 'uuid' in params or 'conversation_uuid' in params:
+      return 'call'
+    elif 'messageId' in params and 'status' in params:
+      return 'receipt'
+    elif 'messageId' in params:
+      return 'inbound'
+    else:
+      return 'unknown'
+
+  def handle(self, path, query, content_type, body, timeout=None):
+    try:
+      params = self.parse(query, content_type, body)
+    except ValueError:
+      return 400
+
+    if self.verify and not self.client.check_signature(params):
+      return 401
+
+    if len(self.threads) < self.workers:
+      self.start()
+
+    try:
+      self.queue.put(Event(self.classify(params), params, path), timeout=self.timeout if timeout is None else timeout)
+    except Full:
+      return 503
+
+    return 200
+
+  def __call__(self, environ, start_response):
+    try:
+      length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+      length = 0
+
+    body = environ['wsgi.input'].read(length) if length else b''
+
+    status = self.handle(environ.get('PATH_INFO', '/'), environ.get('QUERY_STRING', ''), environ.get('CONTENT_TYPE', ''), body)
+
+    start_response(self.statuses[status], [('Content-Type', 'text/plain'), ('Content-Length', '0')])
+
+    return [b'']
+
+  @property
+  def asgi(self):
+    from nexmo.aio import asgi
+
+    return asgi(self)
@@ -17,4 +17,5 @@ setup(name='nexmo',
   license='MIT',
   packages=['nexmo'],
   platforms=['any'],
-  install_requires=['requests', 'PyJWT', 'cryptography'])
+  install_requires=['requests', 'PyJWT', 'cryptography', 'futures; python_version < "3"'],
+  extras_require={'async': ['httpx'], 'http2': ['httpx[http2]']})
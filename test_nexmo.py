@@ -3,18 +3,37 @@ try:
 except ImportError:
   from urlparse import urlparse
 
+try:
+  from urllib.parse import parse_qs
+except ImportError:
+  from urlparse import parse_qs
+
+try:
+  from urllib.parse import urlencode
+except ImportError:
+  from urllib import urlencode
+
 try:
   from urllib.parse import quote_plus
 except ImportError:
   from urllib import quote_plus
 
-import unittest, nexmo, responses, platform, jwt, time
+import unittest, nexmo, nexmo.models, nexmo.outbox, nexmo.pool, nexmo.sms, nexmo.webhooks, responses, platform, jwt, time, json, threading, hmac, hashlib, io, subprocess, sys, pickle, tempfile, shutil, os, socket
+
+import concurrent.futures
 
 
 def request_body():
   return responses.calls[0].request.body
 
 
+def form_params(body):
+  if not isinstance(body, str):
+    body = body.decode('ascii')
+
+  return dict((key, [value.decode('utf-8') if isinstance(value, bytes) else value for value in values]) for key, values in parse_qs(body).items())
+
+
 def request_query():
   return urlparse(responses.calls[0].request.url).query
 
@@ -59,6 +78,105 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertIn('to=447525856424', request_body())
     self.assertIn('text=Hey%21', request_body())
 
+  @responses.activate
+  def test_send_messages(self):
+    def callback(request):
+      return (400, {}, '') if 'to=2' in request.body else (200, {}, '{"key":"value"}')
+
+    responses.add_callback(responses.POST, 'https://rest.nexmo.com/sms/json', callback=callback)
+
+    messages = ({'from': 'Python', 'to': str(n), 'text': 'Hey!'} for n in range(5))
+
+    results = list(self.client.send_messages(messages, workers=2, ordered=True))
+
+    self.assertEqual([result.params['to'] for result in results], ['0', '1', '2', '3', '4'])
+    self.assertEqual([result.response for result in results if result.error is None], [{'key': 'value'}] * 4)
+    self.assertIsInstance(results[2].error, nexmo.ClientError)
+    self.assertIsNone(results[2].response)
+
+  @responses.activate
+  def test_send_messages_unordered(self):
+    self.stub(responses.POST, 'https://rest.nexmo.com/sms/json')
+
+    messages = ({'from': 'Python', 'to': str(n), 'text': 'Hey!'} for n in range(20))
+
+    results = list(self.client.send_messages(messages, workers=4))
+
+    self.assertEqual(sorted(int(result.params['to']) for result in results), list(range(20)))
+    self.assertEqual(len(responses.calls), 20)
+
+  @responses.activate
+  def test_send_messages_template(self):
+    self.stub(responses.POST, 'https://rest.nexmo.com/sms/json')
+
+    template = self.client.message_template({'from': 'Python', 'type': 'unicode', 'callback': 'https://example.com/receipts'})
+
+    messages = ({'to': str(n), 'text': u'Hey \u2713 & bye'} for n in range(3))
+
+    results = list(self.client.send_messages(messages, workers=2, ordered=True, template=template))
+
+    self.assertEqual([result.response for result in results], [{'key': 'value'}] * 3)
+
+    params = form_params(responses.calls[0].request.body)
+
+    self.assertEqual(params['from'], ['Python'])
+    self.assertEqual(params['api_key'], [self.api_key])
+    self.assertEqual(params['text'], [u'Hey \u2713 & bye'])
+    self.assertEqual(responses.calls[0].request.headers['Content-Type'], 'application/x-www-form-urlencoded')
+
+  def test_message_template_encode(self):
+    template = self.client.message_template({'from': 'Python', 'type': 'text'})
+
+    self.assertTrue(template.encode({'to': '1'}).startswith(template.prefix + b'&'))
+    self.assertEqual(parse_qs(template.encode({'to': '1', 'from': 'Other'}).decode('ascii'))['from'], ['Other'])
+    self.assertEqual(template.encode({}), template.prefix)
+
+  @responses.activate
+  def test_message_template_parity(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body='{}', status=200, content_type='application/json')
+
+    for client in (self.client, nexmo.Client(key=None, secret=None)):
+      for params in ({'from': 'Python', 'to': '1', 'text': u'\u2713'}, {'from': 'Python', 'to': '1', 'callback': None}):
+        client.post(client.host, '/sms/json', params)
+        client.message_template({'from': 'Python'}).send(dict((key, value) for key, value in params.items() if key != 'from'))
+        client.message_template(params).send({})
+
+        bodies = [call.request.body for call in responses.calls[-3:]]
+        bodies = [form_params(body) for body in bodies]
+
+        self.assertEqual(bodies[1], bodies[0])
+        self.assertEqual(bodies[2], bodies[0])
+
+  @responses.activate
+  def test_estimate_message(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-phone-pricing/outbound/sms', body='{"price": "0.0333"}', status=200, content_type='application/json')
+
+    analysis, cost = self.client.estimate_message({'from': 'Python', 'to': '447525856424', 'text': u'\u2713' * 71})
+
+    self.assertEqual(analysis, nexmo.sms.Analysis('ucs2', 71, 2, 12))
+    self.assertAlmostEqual(cost, 0.0666)
+    self.assertIn('phone=447525856424', request_query())
+
+  @responses.activate
+  def test_typed_responses(self):
+    body = {'message-count': '1', 'messages': [{'to': '447525856424', 'message-id': '0A0000000123ABCD1', 'status': '0', 'network': '12345'}]}
+
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body=json.dumps(body), status=200, content_type='application/json')
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, typed_responses=True)
+
+    response = self.client.send_message({'from': 'Python', 'to': '447525856424', 'text': 'Hey!'})
+
+    self.assertIsInstance(response, nexmo.models.MessageResponse)
+    self.assertEqual(response.messages[0].message_id, '0A0000000123ABCD1')
+    self.assertIsNone(response.messages[0].error_text)
+    self.assertEqual(response['messages'][0]['status'], '0')
+    self.assertEqual(response, body)
+    self.assertNotIn('error-text', response.messages[0])
+    self.assertFalse(hasattr(response.messages[0], '__dict__'))
+    self.assertIsInstance(self.client.get_balance(), dict)
+
   @responses.activate
   def test_get_balance(self):
     self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
@@ -98,6 +216,57 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertEqual(request_user_agent(), self.user_agent)
     self.assertIn('phone=447525856424', request_query())
 
+  @responses.activate
+  def test_pricing_cache(self):
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-pricing/outbound')
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-phone-pricing/outbound/sms')
+
+    cache = nexmo.Cache(maxsize=2, ttl=60)
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, pricing_cache=cache)
+
+    self.assertIsInstance(self.client.get_country_pricing('GB'), dict)
+    self.assertIsInstance(self.client.get_country_pricing('GB'), dict)
+    self.assertEqual(len(responses.calls), 1)
+
+    self.client.get_country_pricing('US')
+    self.client.get_sms_pricing('447525856424')
+    self.client.get_country_pricing('GB')
+
+    self.assertEqual(len(responses.calls), 4)
+    self.assertEqual(cache.stats(), {'hits': 1, 'misses': 4, 'evictions': 2, 'size': 2})
+
+    cache.invalidate(('/account/get-pricing/outbound', ('country', 'GB')))
+    self.client.get_country_pricing('GB')
+
+    self.assertEqual(len(responses.calls), 5)
+
+  @responses.activate
+  def test_cache_copies(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-pricing/outbound', body='{"networks": [{"price": "0.0333"}]}', status=200, content_type='application/json')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, pricing_cache=nexmo.Cache())
+
+    self.client.get_country_pricing('GB')['networks'][0]['price'] = '0'
+
+    self.assertEqual(self.client.get_country_pricing('GB'), {'networks': [{'price': '0.0333'}]})
+    self.assertEqual(len(responses.calls), 1)
+
+  def test_cache_ttl(self):
+    cache = nexmo.Cache(ttl=0)
+    cache.set('key', 'value')
+
+    self.assertIsNone(cache.get('key'))
+
+    cache = nexmo.Cache(ttl=60)
+    cache.set('key', 'value')
+
+    self.assertEqual(cache.get('key'), 'value')
+
+    cache.invalidate()
+
+    self.assertIsNone(cache.get('key'))
+
   @responses.activate
   def test_update_settings(self):
     self.stub(responses.POST, 'https://rest.nexmo.com/account/settings')
@@ -126,6 +295,104 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertEqual(request_user_agent(), self.user_agent)
     self.assertIn('size=25', request_query())
 
+  @responses.activate
+  def test_iter_account_numbers(self):
+    def callback(request):
+      index = int(parse_qs(urlparse(request.url).query)['index'][0])
+
+      numbers = [{'msisdn': str(n)} for n in range((index - 1) * 2, min(index * 2, 5))]
+
+      return (200, {}, json.dumps({'count': 5, 'numbers': numbers}))
+
+    responses.add_callback(responses.GET, 'https://rest.nexmo.com/account/numbers', callback=callback)
+
+    for prefetch in (False, True):
+      numbers = self.client.iter_account_numbers(size=2, prefetch=prefetch)
+
+      self.assertEqual([number['msisdn'] for number in numbers], ['0', '1', '2', '3', '4'])
+
+    self.assertEqual(len(responses.calls), 6)
+    self.assertIn('size=2', request_query())
+
+  @responses.activate
+  def test_iter_account_numbers_page_cap(self):
+    def callback(request):
+      query = parse_qs(urlparse(request.url).query)
+
+      index, size = int(query['index'][0]), min(int(query['size'][0]), 100)
+
+      numbers = [{'msisdn': str(n)} for n in range((index - 1) * size, min(index * size, 250))]
+
+      return (200, {}, json.dumps({'count': 250, 'numbers': numbers}))
+
+    responses.add_callback(responses.GET, 'https://rest.nexmo.com/account/numbers', callback=callback)
+
+    self.assertEqual(len(list(self.client.iter_account_numbers(size=500))), 250)
+    self.assertEqual(len(responses.calls), 3)
+
+  @responses.activate
+  def test_iter_available_numbers(self):
+    def callback(request):
+      index = int(parse_qs(urlparse(request.url).query)['index'][0])
+
+      numbers = [{'msisdn': str(n)} for n in range((index - 1) * 2, min(index * 2, 3))]
+
+      return (200, {}, json.dumps({'count': 3, 'numbers': numbers}))
+
+    responses.add_callback(responses.GET, 'https://rest.nexmo.com/number/search', callback=callback)
+
+    for prefetch in (False, True):
+      numbers = self.client.iter_available_numbers('GB', size=2, prefetch=prefetch)
+
+      self.assertEqual([number['msisdn'] for number in numbers], ['0', '1', '2'])
+
+    self.assertEqual(len(responses.calls), 4)
+    self.assertIn('country=GB', request_query())
+
+  @responses.activate
+  def test_iter_applications(self):
+    def callback(request):
+      page_index = int(parse_qs(urlparse(request.url).query)['page_index'][0])
+
+      applications = [{'id': str(n)} for n in range(page_index * 2, min(page_index * 2 + 2, 3))]
+
+      return (200, {}, json.dumps({'count': 3, 'page_size': 2, 'page_index': page_index, '_embedded': {'applications': applications}}))
+
+    responses.add_callback(responses.GET, 'https://api.nexmo.com/v1/applications', callback=callback)
+
+    for prefetch in (False, True):
+      applications = self.client.iter_applications(page_size=2, prefetch=prefetch)
+
+      self.assertEqual([application['id'] for application in applications], ['0', '1', '2'])
+
+    self.assertEqual(len(responses.calls), 4)
+    self.assertIn('page_index=1', urlparse(responses.calls[1].request.url).query)
+
+  @responses.activate
+  def test_iter_messages(self):
+    self.stub(responses.GET, 'https://rest.nexmo.com/search/messages')
+    self.stub(responses.GET, 'https://rest.nexmo.com/search/rejections')
+
+    self.assertEqual(list(self.client.iter_messages(date='2016-01-01', to='447525856424', prefetch=True)), [])
+    self.assertEqual(list(self.client.iter_message_rejections(date='2016-01-01', to='447525856424', prefetch=True)), [])
+    self.assertEqual(len(responses.calls), 2)
+    self.assertNotIn('prefetch', request_query())
+
+  @responses.activate
+  def test_iter_calls(self):
+    def callback(request):
+      record_index = int(parse_qs(urlparse(request.url).query)['record_index'][0])
+
+      calls = [{'uuid': str(n)} for n in range(record_index, min(record_index + 100, 150))]
+
+      return (200, {}, json.dumps({'count': 150, 'page_size': 100, 'record_index': record_index, '_embedded': {'calls': calls}}))
+
+    responses.add_callback(responses.GET, 'https://api.nexmo.com/v1/calls', callback=callback)
+
+    self.assertEqual(len(list(self.client.iter_calls(status='completed'))), 150)
+    self.assertEqual(len(responses.calls), 2)
+    self.assertIn('record_index=100', urlparse(responses.calls[1].request.url).query)
+
   @responses.activate
   def test_get_available_numbers(self):
     self.stub(responses.GET, 'https://rest.nexmo.com/number/search')
@@ -204,6 +471,28 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertIn('ids=00A0B0C1', request_query())
     self.assertIn('ids=00A0B0C2', request_query())
 
+  @responses.activate
+  def test_get_message_batching(self):
+    def callback(request):
+      ids = parse_qs(urlparse(request.url).query)['ids']
+
+      return (200, {}, json.dumps({'count': len(ids), 'items': [{'message-id': id, 'status': 'ACCEPTD'} for id in ids if id != 'missing']}))
+
+    responses.add_callback(responses.GET, 'https://rest.nexmo.com/search/messages', callback=callback)
+
+    client = nexmo.Client(key=self.api_key, secret=self.api_secret, message_lookup_window=0.05)
+
+    ids = ['00A0B0C{0}'.format(n) for n in range(12)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=12) as executor:
+      results = list(executor.map(client.get_message, ids))
+
+    self.assertEqual([result['message-id'] for result in results], ids)
+    self.assertEqual(sorted(len(parse_qs(urlparse(call.request.url).query)['ids']) for call in responses.calls), [2, 10])
+
+    self.assertRaises(nexmo.ClientError, client.get_message, 'missing')
+    self.assertEqual(client.get_message(123)['message-id'], '123')
+
   @responses.activate
   def test_send_ussd_push_message(self):
     self.stub(responses.POST, 'https://rest.nexmo.com/ussd/json')
@@ -366,6 +655,13 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertEqual(request_user_agent(), self.user_agent)
     self.assertIn('request_id=xxx', request_query())
 
+  @responses.activate
+  def test_get_verifications(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/verify/search/json')
+
+    self.assertIsInstance(self.client.get_verifications(['xxx', 'yyy']), dict)
+    self.assertIn('request_ids=xxx&request_ids=yyy', request_query())
+
   @responses.activate
   def test_get_verification_request(self):
     self.stub(responses.GET, 'https://api.nexmo.com/verify/search/json')
@@ -430,6 +726,87 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertIn('number=447525856424', request_body())
     self.assertIn('callback=https%3A%2F%2Fexample.com', request_body())
 
+  @responses.activate
+  def test_single_flight(self):
+    release = threading.Event()
+
+    def callback(request):
+      release.wait(1)
+
+      return (200, {}, '{"key":"value"}')
+
+    responses.add_callback(responses.GET, 'https://api.nexmo.com/number/lookup/json', callback=callback)
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, single_flight=True)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+    futures = [executor.submit(self.client.get_number_insight, number='447525856424') for _ in range(4)]
+
+    time.sleep(0.1)
+    release.set()
+
+    results = [future.result() for future in futures]
+
+    self.assertEqual(results, [{'key': 'value'}] * 4)
+    self.assertEqual(len(set(map(id, results))), 4)
+    self.assertEqual(len(responses.calls), 1)
+
+  def test_single_flight_base_exception(self):
+    class Interrupt(BaseException):
+      pass
+
+    flights, release, calls, errors = nexmo.SingleFlight(), threading.Event(), [], []
+
+    def function():
+      calls.append(1)
+
+      release.wait(1)
+
+      raise Interrupt()
+
+    def target():
+      try:
+        flights.do('key', function)
+      except Interrupt as error:
+        errors.append(error)
+
+    threads = [threading.Thread(target=target) for _ in range(2)]
+
+    for thread in threads:
+      thread.daemon = True
+      thread.start()
+
+      time.sleep(0.05)
+
+    release.set()
+
+    for thread in threads:
+      thread.join(1)
+
+    self.assertEqual(len(calls), 1)
+    self.assertEqual(len(errors), 2)
+    self.assertEqual(flights.calls, {})
+
+  @responses.activate
+  def test_insight_cache(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/number/format/json')
+    self.stub(responses.GET, 'https://api.nexmo.com/number/lookup/json')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, insight_cache=nexmo.Cache(ttl=60))
+
+    self.client.get_basic_number_insight(number='447525856424')
+    self.client.get_basic_number_insight(number='447525856424')
+    self.client.get_number_insight(number='447525856424')
+
+    self.assertEqual(len(responses.calls), 2)
+
+    self.client.get_number_insight(number='447525856424', features=['type'])
+    self.client.get_number_insight(number='447525856424', features=['type'])
+    self.client.get_number_insight(number='447525856424', extra={'key': 'value'})
+
+    self.assertEqual(len(responses.calls), 4)
+
   @responses.activate
   def test_get_applications(self):
     self.stub(responses.GET, 'https://api.nexmo.com/v1/applications')
@@ -511,6 +888,23 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertEqual(request_content_type(), 'application/json')
     self.assertEqual(request_body(), b'{"action": "hangup"}')
 
+  @responses.activate
+  def test_codec(self):
+    self.stub(responses.POST, 'https://api.nexmo.com/v1/calls')
+
+    class Codec(object):
+      def loads(self, data):
+        return {'decoded': data}
+
+      def dumps(self, obj):
+        return 'encoded'
+
+    self.client = nexmo.Client(application_id=self.application_id, private_key=self.private_key, codec=Codec())
+
+    self.assertEqual(self.client.create_call(to=[]), {'decoded': b'{"key":"value"}'})
+    self.assertEqual(request_body(), b'encoded')
+    self.assertEqual(request_content_type(), 'application/json')
+
   @responses.activate
   def test_user_provided_authorization(self):
     self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
@@ -531,52 +925,1013 @@ class NexmoClientTestCase(unittest.TestCase):
     self.assertEqual(token['exp'], exp)
 
   @responses.activate
-  def test_authentication_error(self):
-    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=401)
+  def test_token_reuse(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
 
-    self.assertRaises(nexmo.AuthenticationError, self.client.send_message, {})
+    self.client.get_call('xx-xx-xx-xx')
+    self.client.get_call('xx-xx-xx-xx')
+
+    self.assertEqual(responses.calls[0].request.headers['Authorization'], responses.calls[1].request.headers['Authorization'])
 
   @responses.activate
-  def test_client_error(self):
-    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=400)
+  def test_token_signer_change(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
 
-    message = '400 response from rest.nexmo.com'
+    self.client.get_call('xx-xx-xx-xx')
 
-    self.assertRaisesRegex(nexmo.ClientError, message, self.client.send_message, {})
+    self.client.application_id = 'different-nexmo-application-id'
+    self.client.get_call('xx-xx-xx-xx')
+
+    tokens = [jwt.decode(call.request.headers['Authorization'].split()[1], self.public_key, algorithm='RS256') for call in responses.calls]
+
+    self.assertEqual(tokens[0]['application_id'], self.application_id)
+    self.assertEqual(tokens[1]['application_id'], 'different-nexmo-application-id')
 
   @responses.activate
-  def test_server_error(self):
-    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=500)
+  def test_token_refresh(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
 
-    message = '500 response from rest.nexmo.com'
+    self.client = nexmo.Client(application_id=self.application_id, private_key=self.private_key, token_ttl=5, token_refresh_margin=10)
+    self.client.get_call('xx-xx-xx-xx')
+    self.client.get_call('xx-xx-xx-xx')
 
-    self.assertRaisesRegex(nexmo.ServerError, message, self.client.send_message, {})
+    self.assertNotEqual(responses.calls[0].request.headers['Authorization'], responses.calls[1].request.headers['Authorization'])
 
   @responses.activate
-  def test_application_info_options(self):
-    app_name, app_version = 'ExampleApp', 'X.Y.Z'
+  def test_token_per_request(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
+
+    self.client = nexmo.Client(application_id=self.application_id, private_key=self.private_key, token_per_request=True)
+    self.client.get_call('xx-xx-xx-xx')
+    self.client.get_call('xx-xx-xx-xx')
+
+    tokens = [jwt.decode(call.request.headers['Authorization'].split()[1], self.public_key, algorithm='RS256') for call in responses.calls]
+
+    self.assertNotEqual(tokens[0]['jti'], tokens[1]['jti'])
+    self.assertEqual(tokens[0]['exp'] - tokens[0]['iat'], 60)
+
+  @responses.activate
+  def test_rate_limiter(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=429)
+    self.stub(responses.GET, 'https://api.nexmo.com/verify/search/json')
+
+    limiter = nexmo.RateLimiter(rates={'sms': 1000})
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, rate_limiter=limiter)
+
+    self.assertRaises(nexmo.ClientError, self.client.send_message, {})
+    self.assertEqual(limiter.rate('rest.nexmo.com', '/sms/json'), 500)
 
+    self.client.get_verification('xxx')
+
+    self.assertEqual(limiter.rate('api.nexmo.com', '/verify/search/json'), 10)
+
+  def test_rate_limiter_reserve(self):
+    limiter = nexmo.RateLimiter(rates={'sms': 10})
+
+    self.assertEqual(limiter.reserve('rest.nexmo.com', '/sms/json'), 0)
+    self.assertAlmostEqual(limiter.reserve('rest.nexmo.com', '/sms/json'), 0.1, places=2)
+    self.assertAlmostEqual(limiter.reserve('rest.nexmo.com', '/sms/json'), 0.2, places=2)
+    self.assertEqual(limiter.reserve('rest.nexmo.com', '/account/get-balance'), 0)
+    self.assertEqual(limiter.family('/v1/calls/xx-xx-xx-xx'), 'voice')
+    self.assertEqual(limiter.family('/number/lookup/json'), 'number_insight')
+
+  @responses.activate
+  def test_retry(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=503, headers={'Retry-After': '0'})
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=500)
     self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
 
-    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, app_name=app_name, app_version=app_version)
-    self.user_agent = '/'.join(['nexmo-python', nexmo.__version__, platform.python_version(), app_name, app_version])
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, retry=nexmo.Retry(backoff=0))
 
     self.assertIsInstance(self.client.get_balance(), dict)
-    self.assertEqual(request_user_agent(), self.user_agent)
+    self.assertEqual(len(responses.calls), 3)
 
-  def test_check_signature(self):
-    params = {'a': '1', 'b': '2', 'timestamp': '1461605396', 'sig': '6af838ef94998832dbfc29020b564830'}
+  @responses.activate
+  def test_retry_attempts(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=500)
 
-    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret')
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, retry=nexmo.Retry(attempts=2, backoff=0))
 
-    self.assertTrue(self.client.check_signature(params))
+    self.assertRaises(nexmo.ServerError, self.client.get_balance)
+    self.assertEqual(len(responses.calls), 2)
 
-  def test_signature(self):
-    params = {'a': '1', 'b': '2', 'timestamp': '1461605396'}
+  @responses.activate
+  def test_retry_methods(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=500)
+    responses.add(responses.POST, 'https://api.nexmo.com/verify/control/json', status=500)
 
-    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret')
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, retry=nexmo.Retry(backoff=0, endpoints={'/verify/control/': True}))
 
-    self.assertEqual(self.client.signature(params), '6af838ef94998832dbfc29020b564830')
+    self.assertRaises(nexmo.ServerError, self.client.send_message, {})
+    self.assertEqual(len(responses.calls), 1)
+    self.assertRaises(nexmo.ServerError, self.client.cancel_verification, 'xxx')
+    self.assertEqual(len(responses.calls), 4)
+
+  @responses.activate
+  def test_circuit_breaker(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=503)
+    self.stub(responses.GET, 'https://api.nexmo.com/verify/search/json')
+
+    events = []
+
+    breaker = nexmo.CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, circuit_breaker=breaker)
+    self.client.on('circuit', events.append)
+
+    self.assertRaises(nexmo.ServerError, self.client.get_balance)
+    self.assertRaises(nexmo.ServerError, self.client.get_balance)
+    self.assertRaises(nexmo.CircuitOpenError, self.client.get_balance)
+    self.assertEqual(len(responses.calls), 2)
+    self.assertEqual(events, [{'host': 'rest.nexmo.com', 'previous': 'closed', 'state': 'open'}])
+
+    self.client.get_verification('xxx')
+
+    self.assertEqual(breaker.state('api.nexmo.com'), 'closed')
+
+  def test_circuit_breaker_half_open(self):
+    events = []
+
+    emit = lambda name, event: events.append(event)
+
+    breaker = nexmo.CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record('rest.nexmo.com', True, emit)
+    breaker.allow('rest.nexmo.com', emit)
+
+    self.assertRaises(nexmo.CircuitOpenError, breaker.allow, 'rest.nexmo.com')
+
+    breaker.record('rest.nexmo.com', False, emit)
+
+    self.assertEqual([event['state'] for event in events], ['open', 'half_open', 'closed'])
+
+    breaker.record('rest.nexmo.com', True)
+    breaker.allow('rest.nexmo.com')
+    breaker.record('rest.nexmo.com', True)
+
+    self.assertEqual(breaker.circuits['rest.nexmo.com']['state'], 'open')
+
+  @responses.activate
+  def test_timeout(self):
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, timeout=(3.05, 10))
+    self.client.get_balance()
+    self.client.options(timeout=2).get_balance()
+
+    self.assertEqual(responses.calls[0].request.req_kwargs['timeout'], (3.05, 10))
+    self.assertEqual(responses.calls[1].request.req_kwargs['timeout'], 2)
+    self.assertEqual(self.client.timeout, (3.05, 10))
+
+  @responses.activate
+  def test_deadline(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=503)
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, timeout=(3.05, 10), retry=nexmo.Retry(backoff=10, jitter=False))
+
+    self.assertRaises(nexmo.DeadlineExceededError, self.client.options(deadline=5).get_balance)
+    self.assertEqual(len(responses.calls), 1)
+    self.assertLessEqual(responses.calls[0].request.req_kwargs['timeout'][1], 5)
+    self.assertRaises(TypeError, self.client.options, retries=2)
+
+  def test_retry_delay(self):
+    retry = nexmo.Retry(backoff=1, max_backoff=3, jitter=False)
+
+    self.assertEqual([retry.delay(attempt) for attempt in range(1, 5)], [1, 2, 3, 3])
+    self.assertEqual(retry.parse_retry_after('2'), 2)
+    self.assertEqual(retry.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+
+  @responses.activate
+  def test_hooks(self):
+    self.stub(responses.POST, 'https://rest.nexmo.com/sms/json')
+
+    events = []
+
+    self.client.on('request', lambda event: events.append(('request', event)))
+    self.client.on('response', lambda event: events.append(('response', event)))
+    self.client.send_message({'from': 'Python', 'to': '447525856424', 'text': 'Hey!'})
+
+    self.assertEqual([name for name, event in events], ['request', 'response'])
+
+    event = events[1][1]
+
+    self.assertEqual(event['endpoint'], '/sms/json')
+    self.assertEqual(event['host'], 'rest.nexmo.com')
+    self.assertEqual(event['status'], 200)
+    self.assertEqual(event['bytes_sent'], len(request_body()))
+    self.assertEqual(event['bytes_received'], len('{"key":"value"}'))
+    self.assertGreaterEqual(event['total'], 0)
+    self.assertIsNone(event['connect'])
+
+  @responses.activate
+  def test_stats(self):
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls/xx-xx-xx-xx')
+    responses.add(responses.GET, 'https://api.nexmo.com/v1/calls/yy-yy-yy-yy', status=500)
+
+    self.client.get_call('xx-xx-xx-xx')
+    self.assertRaises(nexmo.ServerError, self.client.get_call, 'yy-yy-yy-yy')
+
+    stats = self.client.stats()['GET /v1/calls/:id']
+
+    self.assertEqual(stats['requests'], 2)
+    self.assertEqual(stats['errors'], 1)
+    self.assertEqual(stats['statuses'], {200: 1, 500: 1})
+    self.assertEqual(stats['latency']['count'], 2)
+    self.assertEqual(sum(count for bucket, count in stats['latency']['buckets']), 2)
+
+  def test_histogram_percentile(self):
+    histogram = nexmo.Histogram()
+
+    for value in [0.001] * 90 + [0.2] * 9 + [3]:
+      histogram.observe(value)
+
+    self.assertEqual(histogram.percentile(0.5), 0.005)
+    self.assertEqual(histogram.percentile(0.95), 0.25)
+    self.assertEqual(histogram.percentile(1), 5)
+
+  @responses.activate
+  def test_authentication_error(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=401)
+
+    self.assertRaises(nexmo.AuthenticationError, self.client.send_message, {})
+
+  @responses.activate
+  def test_client_error(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=400)
+
+    message = '400 response from rest.nexmo.com'
+
+    self.assertRaisesRegex(nexmo.ClientError, message, self.client.send_message, {})
+
+  @responses.activate
+  def test_server_error(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', status=500)
+
+    message = '500 response from rest.nexmo.com'
+
+    self.assertRaisesRegex(nexmo.ServerError, message, self.client.send_message, {})
+
+  @responses.activate
+  def test_application_info_options(self):
+    app_name, app_version = 'ExampleApp', 'X.Y.Z'
+
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, app_name=app_name, app_version=app_version)
+    self.user_agent = '/'.join(['nexmo-python', nexmo.__version__, platform.python_version(), app_name, app_version])
+
+    self.assertIsInstance(self.client.get_balance(), dict)
+    self.assertEqual(request_user_agent(), self.user_agent)
+
+  def test_check_signature(self):
+    params = {'a': '1', 'b': '2', 'timestamp': '1461605396', 'sig': '6af838ef94998832dbfc29020b564830'}
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret')
+
+    self.assertTrue(self.client.check_signature(params))
+
+  def test_signature(self):
+    params = {'a': '1', 'b': '2', 'timestamp': '1461605396'}
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret')
+
+    self.assertEqual(self.client.signature(params), '6af838ef94998832dbfc29020b564830')
+
+  @responses.activate
+  def test_session_reuse(self):
+    self.stub(responses.GET, 'https://rest.nexmo.com/account/get-balance')
+    self.stub(responses.GET, 'https://api.nexmo.com/v1/calls')
+
+    self.client.get_balance()
+    self.client.get_balance()
+    self.client.get_calls()
+
+    self.assertEqual(len(responses.calls), 3)
+    self.assertIs(self.client.session('rest.nexmo.com'), self.client.session('rest.nexmo.com'))
+    self.assertIsNot(self.client.session('rest.nexmo.com'), self.client.session('api.nexmo.com'))
+    self.assertEqual(sorted(self.client.sessions), ['api.nexmo.com', 'rest.nexmo.com'])
+
+  def test_session_pool_options(self):
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, pool_maxsize=50, pool_block=True)
+
+    adapter = self.client.session('rest.nexmo.com').get_adapter('https://rest.nexmo.com/')
+
+    self.assertEqual(adapter._pool_maxsize, 50)
+    self.assertTrue(adapter._pool_block)
+
+  def test_close(self):
+    with nexmo.Client(key=self.api_key, secret=self.api_secret) as client:
+      client.session('rest.nexmo.com')
+
+      self.assertEqual(len(client.sessions), 1)
+
+    self.assertEqual(client.sessions, {})
+
+  def test_lazy_imports(self):
+    code = 'import sys, nexmo; print(" ".join(name for name in ("jwt", "cryptography", "uuid", "asyncio", "httpx", "sqlite3") if name in sys.modules))'
+
+    self.assertEqual(subprocess.check_output([sys.executable, '-c', code]).strip(), b'')
+
+  def test_check_signatures(self):
+    valid = {'a': '1', 'b': '2', 'timestamp': '1461605396', 'sig': '6af838ef94998832dbfc29020b564830'}
+    invalid = dict(valid, sig='invalid')
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret')
+
+    self.assertEqual(self.client.check_signatures([valid, invalid, valid]), [True, False, True])
+    self.assertEqual(self.client.check_signatures([valid, invalid] * 10, processes=2, chunksize=4), [True, False] * 10)
+
+    executor = self.client.signature_executor(2)
+
+    self.assertEqual(self.client.check_signatures([invalid, valid], processes=2), [False, True])
+    self.assertIs(self.client.signature_executor(2), executor)
+
+    self.client.close()
+
+    self.assertIsNone(self.client.signature_pool)
+
+  def test_hmac_signature(self):
+    params = {'a': '1&2', 'b': '3=4', 'timestamp': '1461605396'}
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret', signature_method='sha256')
+
+    expected = hmac.new(b'secret', b'&a=1_2&b=3_4&timestamp=1461605396', hashlib.sha256).hexdigest()
+
+    self.assertEqual(self.client.signature(params), expected)
+    self.assertTrue(self.client.check_signature(dict(params, sig=expected.upper())))
+    self.assertFalse(self.client.check_signature(dict(params, sig=expected[::-1])))
+
+  def test_hmac_signature_unicode(self):
+    params = {'text': u'caf\xe9', 'timestamp': '1461605396'}
+
+    self.client = nexmo.Client(key=self.api_key, secret=self.api_secret, signature_secret='secret', signature_method='sha256')
+
+    expected = hmac.new(b'secret', b'&text=caf\xc3\xa9&timestamp=1461605396', hashlib.sha256).hexdigest()
+
+    self.assertEqual(self.client.signature(params), expected)
+    self.assertTrue(self.client.check_signature(dict(params, sig=expected)))
+
+
+class H2Server(threading.Thread):
+  def __init__(self):
+    threading.Thread.__init__(self)
+
+    self.daemon = True
+
+    self.socket = socket.socket()
+    self.socket.bind(('127.0.0.1', 0))
+    self.socket.listen(5)
+
+    self.connections = 0
+
+    self.paths = []
+
+  def run(self):
+    while True:
+      try:
+        sock, address = self.socket.accept()
+      except (OSError, socket.error):
+        return
+
+      self.connections += 1
+
+      thread = threading.Thread(target=self.serve, args=(sock,))
+      thread.daemon = True
+      thread.start()
+
+  def serve(self, sock):
+    import h2.config, h2.connection, h2.events
+
+    connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+    connection.initiate_connection()
+
+    sock.sendall(connection.data_to_send())
+
+    paths = {}
+
+    while True:
+      data = sock.recv(65535)
+
+      if not data:
+        return
+
+      for event in connection.receive_data(data):
+        if isinstance(event, h2.events.RequestReceived):
+          paths[event.stream_id] = dict(event.headers)[b':path'].decode('utf-8')
+        elif isinstance(event, h2.events.DataReceived):
+          connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+          self.paths.append(paths[event.stream_id])
+
+          body = json.dumps({'path': paths.pop(event.stream_id)}).encode('utf-8')
+
+          connection.send_headers(event.stream_id, [(':status', '200'), ('content-type', 'application/json'), ('content-length', str(len(body)))])
+          connection.send_data(event.stream_id, body, end_stream=True)
+
+      sock.sendall(connection.data_to_send())
+
+  def close(self):
+    self.socket.close()
+
+
+class NexmoTransportTestCase(unittest.TestCase):
+  def setUp(self):
+    self.private_key = open('test/private_key.txt').read()
+
+    self.requests = []
+
+    self.transport = nexmo.MemoryTransport(self.handler)
+
+    self.client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', application_id='nexmo-application-id', private_key=self.private_key, transport=self.transport)
+
+  def handler(self, request):
+    self.requests.append(request)
+
+    return 200, {'Content-Type': 'application/json'}, {'key': 'value'}
+
+  def test_memory_transport(self):
+    self.assertEqual(self.client.send_message({'from': 'Python', 'to': '447525856424', 'text': 'Hey!'}), {'key': 'value'})
+    self.assertEqual(self.client.get_balance(), {'key': 'value'})
+    self.assertEqual(self.client.create_call(to=[{'type': 'phone', 'number': '14843331234'}]), {'key': 'value'})
+
+    self.assertEqual(self.requests[0].url, 'https://rest.nexmo.com/sms/json')
+    self.assertIn(b'text=Hey%21', self.requests[0].body)
+    self.assertIn('api_key=nexmo-api-key', self.requests[1].url)
+    self.assertEqual(self.requests[2].headers['Content-Type'], 'application/json')
+    self.assertEqual(json.loads(self.requests[2].body.decode('utf-8'))['to'][0]['number'], '14843331234')
+    self.assertEqual(self.client.stats()['POST /sms/json']['requests'], 1)
+
+  def test_sessions(self):
+    self.assertEqual(self.client.sessions, {})
+    self.assertEqual(nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', http2=True).sessions, {})
+
+  def test_memory_transport_errors(self):
+    self.transport.handler = lambda request: (500, {}, '')
+
+    self.assertRaises(nexmo.ServerError, self.client.get_balance)
+
+  def test_circuit_breaker_probe_released(self):
+    responses = iter([(500, {}, ''), ValueError('handler failed'), (200, {}, {'key': 'value'})])
+
+    def handler(request):
+      response = next(responses)
+
+      if isinstance(response, Exception):
+        raise response
+
+      return response
+
+    self.transport.handler = handler
+    self.client.circuit_breaker = nexmo.CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+
+    self.assertRaises(nexmo.ServerError, self.client.get_balance)
+    self.assertRaises(ValueError, self.client.get_balance)
+    self.assertEqual(self.client.get_balance(), {'key': 'value'})
+    self.assertEqual(self.client.circuit_breaker.state('rest.nexmo.com'), 'closed')
+
+  def test_circuit_breaker_probe_released_on_deadline(self):
+    self.transport.handler = lambda request: (500, {}, '')
+
+    self.client.circuit_breaker = nexmo.CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    self.client.rate_limiter = nexmo.RateLimiter(rates={'verify': 2})
+
+    self.assertRaises(nexmo.ServerError, self.client.get_verification, 'xxx')
+    self.assertRaises(nexmo.DeadlineExceededError, self.client.options(deadline=0.1).get_verification, 'xxx')
+
+    self.transport.handler = self.handler
+
+    self.assertEqual(self.client.get_verification('xxx'), {'key': 'value'})
+    self.assertEqual(self.client.circuit_breaker.state('api.nexmo.com'), 'closed')
+
+  def test_hedge(self):
+    lock = threading.Lock()
+
+    def handler(request):
+      with lock:
+        self.requests.append(request)
+
+        first = len(self.requests) == 1
+
+      if first:
+        time.sleep(0.5)
+
+      return 200, {}, {'value': len(self.requests)}
+
+    self.transport.handler = handler
+    self.client.hedge = nexmo.Hedge(after=0.05)
+
+    start = time.time()
+
+    self.assertEqual(self.client.get_balance(), {'value': 2})
+    self.assertLess(time.time() - start, 0.4)
+
+    self.client.send_message({'from': 'Python', 'to': '447525856424', 'text': 'Hey!'})
+
+    self.assertEqual(len(self.requests), 3)
+
+  def test_hedge_concurrency(self):
+    self.transport.handler = lambda request: time.sleep(0.2) or (200, {}, {'key': 'value'})
+    self.client.hedge = nexmo.Hedge(after=5, workers=2)
+
+    start = time.time()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+      results = list(executor.map(lambda n: self.client.get_balance(), range(20)))
+
+    self.assertEqual(results, [{'key': 'value'}] * 20)
+    self.assertLess(time.time() - start, 1)
+    self.assertIsNone(self.client.hedge.pool)
+
+    self.client.hedge.after = 0.01
+    self.client.get_balance()
+    self.client.close()
+
+    self.assertIsNone(self.client.hedge.pool)
+
+  def test_hedge_delay(self):
+    hedge = nexmo.Hedge(percentile=0.95, min_samples=2)
+    histogram = nexmo.Histogram()
+
+    self.assertTrue(hedge.allowed('GET', '/number/lookup/json'))
+    self.assertFalse(hedge.allowed('POST', '/ni/json'))
+    self.assertTrue(hedge.allowed('GET', '/search/message'))
+    self.assertFalse(hedge.allowed('GET', '/search/messages'))
+    self.assertTrue(hedge.allowed('GET', '/account/get-balance'))
+    self.assertIsNone(hedge.delay(histogram))
+
+    histogram.observe(0.02)
+    histogram.observe(0.2)
+
+    self.assertEqual(hedge.delay(histogram), 0.25)
+
+  def test_base_uris(self):
+    self.client.base_uris = {'rest.nexmo.com': 'http://127.0.0.1:8080'}
+
+    self.client.get_balance()
+
+    self.assertTrue(self.requests[0].url.startswith('http://127.0.0.1:8080/account/get-balance?'))
+
+  @unittest.skipUnless(sys.version_info >= (3, 6), 'requires Python 3.6+')
+  def test_http2_timeout(self):
+    try:
+      import httpx
+    except ImportError:
+      raise unittest.SkipTest('requires httpx')
+
+    transport = nexmo.HTTP2Transport()
+
+    self.assertEqual(transport.session().timeout, httpx.Timeout(None))
+    self.assertEqual(nexmo.HTTP2Transport(timeout=3).session().timeout, httpx.Timeout(3))
+
+    transport.close()
+
+  def test_http2(self):
+    try:
+      import httpx, h2
+    except ImportError:
+      raise unittest.SkipTest('requires httpx and h2')
+
+    server = H2Server()
+    server.start()
+
+    base_uri = 'http://127.0.0.1:{0}'.format(server.socket.getsockname()[1])
+
+    client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', transport=nexmo.HTTP2Transport(http1=False), base_uris={'rest.nexmo.com': base_uri})
+
+    events = []
+
+    client.on('response', events.append)
+
+    try:
+      with client:
+        results = list(client.send_messages(({'from': 'Python', 'to': str(n), 'text': 'Hey!'} for n in range(10)), workers=5))
+    finally:
+      server.close()
+
+    self.assertEqual([result.response for result in results], [{'path': '/sms/json'}] * 10)
+    self.assertEqual(server.connections, 1)
+    self.assertEqual(len(server.paths), 10)
+    self.assertEqual(len([event for event in events if event['connect'] > 0]), 1)
+
+
+class NexmoClientPoolTestCase(unittest.TestCase):
+  def setUp(self):
+    self.pool = nexmo.ClientPool([{'key': 'key-1', 'secret': 'secret-1'}, {'key': 'key-2', 'secret': 'secret-2'}], cooldown=60)
+
+  def api_keys(self):
+    return [parse_qs(call.request.body)['api_key'][0] for call in responses.calls]
+
+  @responses.activate
+  def test_round_robin(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body='{"key":"value"}', status=200, content_type='application/json')
+
+    for n in range(4):
+      self.assertEqual(self.pool.send_message({'from': 'Python', 'to': str(n), 'text': 'Hey!'}), {'key': 'value'})
+
+    self.assertEqual(self.api_keys(), ['key-1', 'key-2', 'key-1', 'key-2'])
+
+  @responses.activate
+  def test_sticky(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body='{"key":"value"}', status=200, content_type='application/json')
+
+    self.pool.strategy = nexmo.pool.Sticky('from')
+
+    for n in range(6):
+      self.pool.send_message({'from': 'Sender{0}'.format(n % 2), 'to': str(n), 'text': 'Hey!'})
+
+    keys = self.api_keys()
+
+    self.assertEqual(keys[0::2], [keys[0]] * 3)
+    self.assertEqual(keys[1::2], [keys[1]] * 3)
+
+  def test_least_loaded(self):
+    self.pool.strategy = nexmo.pool.LeastLoaded()
+
+    self.pool.members[0].in_flight = 2
+
+    self.assertIs(self.pool.choose('send_message', (), {}), self.pool.members[1])
+
+  @responses.activate
+  def test_unhealthy_member(self):
+    responses.add(responses.GET, 'https://rest.nexmo.com/account/get-balance', status=500)
+
+    self.pool.failure_threshold = 1
+    self.pool.members[1].client.get_balance = lambda: {'value': 1.0}
+
+    self.assertRaises(nexmo.ServerError, self.pool.get_balance)
+
+    health = self.pool.health()
+
+    self.assertFalse(health[0]['healthy'])
+    self.assertEqual(health[0]['errors'], 1)
+    self.assertTrue(health[1]['healthy'])
+
+    for n in range(3):
+      self.assertEqual(self.pool.get_balance(), {'value': 1.0})
+
+  @responses.activate
+  def test_send_messages(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body='{"key":"value"}', status=200, content_type='application/json')
+
+    results = list(self.pool.send_messages(({'from': 'Python', 'to': str(n), 'text': 'Hey!'} for n in range(10)), workers=2))
+
+    self.assertEqual(len(results), 10)
+    self.assertEqual(sorted(self.api_keys()), ['key-1'] * 5 + ['key-2'] * 5)
+
+  def test_per_credential_rate_limiter(self):
+    pool = nexmo.ClientPool([{'key': 'key-1'}, {'key': 'key-2'}], rates={'sms': 5})
+
+    limiters = [client.rate_limiter for client in pool.clients]
+
+    self.assertIsNot(limiters[0], limiters[1])
+    self.assertEqual(limiters[0].rates['sms'], 5)
+
+  def test_unknown_attribute(self):
+    self.assertRaises(AttributeError, getattr, self.pool, 'missing')
+
+
+class NexmoOutboxTestCase(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+    self.client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret')
+
+    self.body = '{"message-count": "1", "messages": [{"message-id": "0A0000000123ABCD1", "status": "0"}]}'
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def message(self, n):
+    return {'from': 'Python', 'to': str(n), 'text': 'Hey!'}
+
+  def run_outbox(self, journal):
+    with nexmo.Outbox(self.client, journal, batch_size=2) as outbox:
+      keys = [outbox.add(self.message(n)) for n in range(3)]
+
+      self.assertEqual(outbox.add(self.message(0)), keys[0])
+      self.assertEqual([item['key'] for item in outbox.pending()], keys)
+
+      results = list(outbox.send())
+
+    self.assertEqual(len(results), 3)
+    self.assertEqual(len(responses.calls), 3)
+    self.assertEqual(set(parse_qs(call.request.body)['client-ref'][0] for call in responses.calls), set(keys))
+
+    return keys
+
+  @responses.activate
+  def test_resume_sqlite(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body=self.body, status=200, content_type='application/json')
+
+    keys = self.run_outbox(self.path('outbox.db'))
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      self.assertEqual(outbox.add(self.message(1)), keys[1])
+      self.assertEqual(list(outbox.send()), [])
+      self.assertEqual(outbox.state(keys[2]), 'sent')
+      self.assertEqual(outbox.entries[keys[2]]['message_ids'], ['0A0000000123ABCD1'])
+
+    self.assertEqual(len(responses.calls), 3)
+
+  @responses.activate
+  def test_resume_file(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body=self.body, status=200, content_type='application/json')
+
+    keys = self.run_outbox(nexmo.outbox.FileJournal(self.path('outbox.log')))
+
+    with open(self.path('outbox.log'), 'a') as fd:
+      fd.write('{"key": "trunc')
+
+    with nexmo.Outbox(self.client, nexmo.outbox.FileJournal(self.path('outbox.log'))) as outbox:
+      self.assertEqual(list(outbox.send()), [])
+      self.assertEqual([outbox.state(key) for key in keys], ['sent'] * 3)
+      self.assertEqual(outbox.entries[keys[0]]['params']['to'], '0')
+
+  @responses.activate
+  def test_in_doubt(self):
+    responses.add(responses.POST, 'https://rest.nexmo.com/sms/json', body=self.body, status=200, content_type='application/json')
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      key = outbox.add(self.message(0))
+      outbox.flush()
+      outbox.update([outbox.entries[key]], 'submitted')
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      self.assertEqual([item['key'] for item in outbox.in_doubt()], [key])
+      self.assertEqual(list(outbox.send()), [])
+
+      outbox.requeue(key)
+
+      self.assertEqual(len(list(outbox.send())), 1)
+      self.assertEqual(outbox.state(key), 'sent')
+
+  @responses.activate
+  def test_errors(self):
+    def callback(request):
+      return (400, {}, '') if 'to=0' in request.body else (500, {}, '')
+
+    responses.add_callback(responses.POST, 'https://rest.nexmo.com/sms/json', callback=callback)
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      keys = [outbox.add(self.message(n)) for n in range(2)]
+
+      list(outbox.send())
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      self.assertEqual(outbox.state(keys[0]), 'failed')
+      self.assertEqual(outbox.state(keys[1]), 'submitted')
+
+  @responses.activate
+  def test_message_status(self):
+    statuses = {'0': ('1', 'Throttled'), '1': ('3', 'Invalid value for param: to')}
+
+    def callback(request):
+      status, error_text = statuses[parse_qs(request.body)['to'][0]]
+
+      return (200, {}, json.dumps({'message-count': '1', 'messages': [{'status': status, 'error-text': error_text}]}))
+
+    responses.add_callback(responses.POST, 'https://rest.nexmo.com/sms/json', callback=callback)
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      keys = [outbox.add(self.message(n)) for n in range(2)]
+
+      list(outbox.send())
+
+    with nexmo.Outbox(self.client, self.path('outbox.db')) as outbox:
+      self.assertEqual(outbox.state(keys[0]), 'pending')
+      self.assertEqual(outbox.state(keys[1]), 'failed')
+      self.assertEqual(outbox.entries[keys[1]]['error'], 'Invalid value for param: to')
+
+      statuses['0'] = ('0', None)
+
+      list(outbox.send())
+
+      self.assertEqual(outbox.state(keys[0]), 'sent')
+
+
+class NexmoVerifySessionsTestCase(unittest.TestCase):
+  def setUp(self):
+    self.client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret')
+
+    self.sessions = nexmo.VerifySessions(self.client, interval=5, expiry=60, next_event=30)
+
+    self.statuses = {}
+
+    responses.add_callback(responses.GET, 'https://api.nexmo.com/verify/search/json', callback=self.search)
+    responses.add(responses.POST, 'https://api.nexmo.com/verify/control/json', body='{"status": "0"}', status=200, content_type='application/json')
+
+  def search(self, request):
+    ids = parse_qs(urlparse(request.url).query)['request_ids']
+
+    return (200, {}, json.dumps({'verification_requests': [{'request_id': id, 'status': self.statuses[id]} for id in ids if id in self.statuses]}))
+
+  def searches(self):
+    return [call for call in responses.calls if '/verify/search/' in call.request.url]
+
+  @responses.activate
+  def test_batched_lookups(self):
+    futures = [self.sessions.track(str(n), now=0) for n in range(12)]
+
+    self.statuses = dict((str(n), 'IN PROGRESS') for n in range(12))
+    self.statuses['3'] = 'SUCCESS'
+
+    self.sessions.run_pending(now=1)
+
+    self.assertEqual(len(responses.calls), 0)
+
+    self.sessions.run_pending(now=5)
+
+    self.assertEqual(len(self.searches()), 2)
+    self.assertEqual(futures[3].result(0)['status'], 'SUCCESS')
+    self.assertFalse(futures[4].done())
+    self.assertEqual(len(self.sessions), 11)
+
+  @responses.activate
+  def test_next_event_and_expiry(self):
+    future = self.sessions.track('xxx', now=0)
+
+    self.statuses['xxx'] = 'IN PROGRESS'
+
+    self.sessions.run_pending(now=30)
+
+    self.assertIn('cmd=trigger_next_event', responses.calls[0].request.body)
+
+    self.sessions.run_pending(now=60)
+
+    with self.assertRaises(nexmo.VerificationExpiredError) as context:
+      future.result(0)
+
+    self.assertIsInstance(context.exception, nexmo.DeadlineExceededError)
+    self.assertEqual(context.exception.verification['status'], 'IN PROGRESS')
+    self.assertEqual(len(self.sessions), 0)
+
+  @responses.activate
+  def test_check(self):
+    responses.add(responses.POST, 'https://api.nexmo.com/verify/check/json', body='{"status": "0", "event_id": "yyy"}', status=200, content_type='application/json')
+
+    future = self.sessions.track('xxx', now=0)
+
+    self.sessions.check('xxx', '1234')
+
+    self.assertEqual(future.result(0)['status'], 'SUCCESS')
+
+    self.sessions.run_pending(now=5)
+
+    self.assertEqual(self.searches(), [])
+
+  @responses.activate
+  def test_cancel(self):
+    future = self.sessions.track('xxx', now=0)
+
+    self.sessions.cancel('xxx')
+
+    self.assertTrue(future.cancelled())
+
+  @responses.activate
+  def test_start_verification_error(self):
+    responses.add(responses.POST, 'https://api.nexmo.com/verify/json', body='{"status": "3", "error_text": "Invalid value"}', status=200, content_type='application/json')
+
+    future = self.sessions.start_verification(number='447525856424', brand='MyApp')
+
+    self.assertRaises(nexmo.ClientError, future.result, 0)
+
+  @responses.activate
+  def test_background_thread(self):
+    responses.add(responses.POST, 'https://api.nexmo.com/verify/json', body='{"status": "0", "request_id": "xxx"}', status=200, content_type='application/json')
+
+    self.sessions.interval = 0.01
+    self.statuses['xxx'] = 'FAILED'
+    self.sessions.start()
+
+    try:
+      self.assertEqual(self.sessions.start_verification(number='447525856424', brand='MyApp').result(5)['status'], 'FAILED')
+    finally:
+      self.sessions.stop()
+
+
+class NexmoModelsTestCase(unittest.TestCase):
+  def test_lazy_decoding(self):
+    calls = []
+
+    class Codec(nexmo.JSONCodec):
+      def loads(self, data):
+        calls.append(data)
+
+        return nexmo.JSONCodec.loads(self, data)
+
+    call = nexmo.models.Call(content=b'{"uuid": "xx-xx-xx-xx", "from": {"type": "phone"}, "extra": 1}', codec=Codec())
+
+    self.assertEqual(calls, [])
+    self.assertEqual(call.uuid, 'xx-xx-xx-xx')
+    self.assertEqual(call.from_, {'type': 'phone'})
+    self.assertEqual(call['extra'], 1)
+    self.assertEqual(len(calls), 1)
+    self.assertEqual(sorted(call), ['extra', 'from', 'uuid'])
+
+  def test_pickle(self):
+    verification = nexmo.models.Verification({'request_id': 'xxx', 'status': 'SUCCESS', 'checks': [{'code': '1234', 'status': 'VALID'}]})
+
+    verification = pickle.loads(pickle.dumps(verification))
+
+    self.assertEqual(verification.checks[0].code, '1234')
+    self.assertEqual(dict(verification.checks[0]), {'code': '1234', 'status': 'VALID'})
+
+
+class NexmoSMSTestCase(unittest.TestCase):
+  def test_gsm(self):
+    self.assertEqual(nexmo.sms.analyse('Hello world'), nexmo.sms.Analysis('gsm', 11, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('a' * 160), nexmo.sms.Analysis('gsm', 160, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('a' * 161), nexmo.sms.Analysis('gsm', 161, 2, 12))
+
+  def test_gsm_extension(self):
+    self.assertEqual(nexmo.sms.analyse(u'\u20ac' * 80), nexmo.sms.Analysis('gsm', 160, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('a' * 152 + '[' + 'a' * 154), nexmo.sms.Analysis('gsm', 308, 3, 18))
+
+  def test_unicode(self):
+    self.assertEqual(nexmo.sms.analyse(u'caf\u00e9 \u2713'), nexmo.sms.Analysis('ucs2', 6, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('Hello', type='unicode'), nexmo.sms.Analysis('ucs2', 5, 1, 0))
+    self.assertEqual(nexmo.sms.analyse(u'\U0001F600' * 35), nexmo.sms.Analysis('ucs2', 70, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('a' * 66 + u'\U0001F600'), nexmo.sms.Analysis('ucs2', 68, 1, 0))
+    self.assertEqual(nexmo.sms.analyse('a' * 66 + u'\U0001F600' + 'a' * 3), nexmo.sms.Analysis('ucs2', 71, 2, 12))
+
+  def test_analyse_many(self):
+    texts = ['Hello', u'\u2713', 'Hello']
+
+    self.assertEqual([analysis.encoding for analysis in nexmo.sms.analyse_many(texts)], ['gsm', 'ucs2', 'gsm'])
+
+
+class NexmoWebhookAppTestCase(unittest.TestCase):
+  def setUp(self):
+    self.client = nexmo.Client(key='nexmo-api-key', secret='nexmo-api-secret', signature_secret='secret')
+    self.app = nexmo.webhooks.WebhookApp(self.client, workers=1, queue_size=1, timeout=0.01)
+    self.events = []
+    self.app.on('*', self.events.append)
+
+  def tearDown(self):
+    self.app.stop()
+
+  def call(self, query='', body=b'', content_type='application/x-www-form-urlencoded'):
+    environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/webhooks', 'QUERY_STRING': query, 'CONTENT_TYPE': content_type, 'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)}
+    statuses = []
+
+    self.app(environ, lambda status, headers: statuses.append(status))
+
+    return statuses[0]
+
+  def test_receipt(self):
+    params = {'messageId': '0A0000000123ABCD1', 'status': 'delivered', 'timestamp': '1461605396'}
+
+    query = urlencode(dict(params, sig=self.client.signature(params)))
+
+    self.assertEqual(self.call(query), '200 OK')
+
+    self.app.queue.join()
+
+    self.assertEqual(self.events[0].type, 'receipt')
+    self.assertEqual(self.events[0].params['status'], 'delivered')
+    self.assertEqual(self.events[0].path, '/webhooks')
+
+  def test_invalid_signature(self):
+    self.assertEqual(self.call('messageId=0A0000000123ABCD1&sig=invalid'), '401 Unauthorized')
+    self.assertEqual(self.events, [])
+
+  def test_call_event(self):
+    self.app.verify = False
+
+    self.assertEqual(self.call(body=b'{"uuid": "xx-xx-xx-xx", "status": "answered"}', content_type='application/json'), '200 OK')
+
+    self.app.queue.join()
+
+    self.assertEqual(self.events[0].type, 'call')
+
+  def test_invalid_json(self):
+    self.app.verify = False
+
+    for body in (b'[1, 2]', b'123', b'"text"', b'{'):
+      self.assertEqual(self.call(body=body, content_type='application/json'), '400 Bad Request')
+
+    self.assertEqual(self.events, [])
+
+  def test_verify_requires_client(self):
+    self.assertRaises(ValueError, nexmo.webhooks.WebhookApp, verify=True)
+
+  def test_backpressure(self):
+    started, release = threading.Event(), threading.Event()
+
+    self.app.verify = False
+    self.app.on('inbound', lambda event: started.set() or release.wait(1))
+
+    self.assertEqual(self.call('messageId=1&text=a'), '200 OK')
+
+    started.wait(1)
+
+    self.assertEqual(self.call('messageId=2&text=b'), '200 OK')
+    self.assertEqual(self.call('messageId=3&text=c'), '503 Service Unavailable')
+
+    release.set()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,177 @@
+try:
+  import httpx
+except ImportError:
+  httpx = None
+
+import unittest, nexmo, nexmo.webhooks, asyncio
+
+
+def run_until_complete(coroutine):
+  loop = asyncio.new_event_loop()
+
+  try:
+    return loop.run_until_complete(coroutine)
+  finally:
+    loop.close()
+
+
+@unittest.skipUnless(httpx, 'requires httpx')
+class NexmoAsyncClientTestCase(unittest.TestCase):
+  def setUp(self):
+    self.requests = []
+    self.status = 200
+    self.private_key = open('test/private_key.txt').read()
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', application_id='nexmo-application-id', private_key=self.private_key, transport=httpx.MockTransport(self.handler))
+
+  def handler(self, request):
+    self.requests.append(request)
+
+    if self.status == 204:
+      return httpx.Response(204)
+
+    return httpx.Response(self.status, json={'key': 'value'})
+
+  def run_client(self, method, *args, **kwargs):
+    async def run():
+      async with self.client:
+        return await getattr(self.client, method)(*args, **kwargs)
+
+    return run_until_complete(run())
+
+  def test_send_message(self):
+    self.assertEqual(self.run_client('send_message', {'from': 'Python', 'to': '447525856424', 'text': 'Hey!'}), {'key': 'value'})
+    self.assertEqual(str(self.requests[0].url), 'https://rest.nexmo.com/sms/json')
+    self.assertIn(b'text=Hey%21', self.requests[0].content)
+    self.assertIn(b'api_key=nexmo-api-key', self.requests[0].content)
+
+  def test_sessions(self):
+    self.assertEqual(self.client.sessions, {})
+    self.assertEqual(nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret').sessions, {})
+
+  def test_get_country_pricing(self):
+    self.assertEqual(self.run_client('get_country_pricing', 'GB'), {'key': 'value'})
+    self.assertEqual(self.requests[0].url.params['country'], 'GB')
+
+  def test_create_call(self):
+    self.assertEqual(self.run_client('create_call', to=[{'type': 'phone', 'number': '14843331234'}]), {'key': 'value'})
+    self.assertEqual(self.requests[0].headers['Content-Type'], 'application/json')
+    self.assertTrue(self.requests[0].headers['Authorization'].startswith('Bearer '))
+
+  def test_delete_application(self):
+    self.status = 204
+
+    self.assertIsNone(self.run_client('delete_application', 'xx-xx-xx-xx'))
+
+  def test_server_error(self):
+    self.status = 500
+
+    self.assertRaises(nexmo.ServerError, self.run_client, 'get_balance')
+
+  def test_send_messages(self):
+    async def run():
+      async with self.client:
+        messages = ({'from': 'Python', 'to': str(n), 'text': 'Hey!'} for n in range(10))
+
+        return [result async for result in self.client.send_messages(messages, workers=3, ordered=True)]
+
+    results = run_until_complete(run())
+
+    self.assertEqual([result.params['to'] for result in results], [str(n) for n in range(10)])
+    self.assertEqual(len(self.requests), 10)
+
+  def test_iter_account_numbers(self):
+    def handler(request):
+      self.requests.append(request)
+
+      index = int(request.url.params['index'])
+
+      return httpx.Response(200, json={'count': 3, 'numbers': [{'msisdn': str(n)} for n in range((index - 1) * 2, min(index * 2, 3))]})
+
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', transport=httpx.MockTransport(handler))
+
+    async def run():
+      async with self.client:
+        return [number['msisdn'] async for number in self.client.iter_account_numbers(size=2, prefetch=True)]
+
+    self.assertEqual(run_until_complete(run()), ['0', '1', '2'])
+    self.assertEqual(len(self.requests), 2)
+
+  def test_single_flight(self):
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', single_flight=True, transport=httpx.MockTransport(self.handler))
+
+    async def run():
+      async with self.client:
+        return await asyncio.gather(*[self.client.get_number_insight(number='447525856424') for _ in range(5)])
+
+    results = run_until_complete(run())
+
+    self.assertEqual(results, [{'key': 'value'}] * 5)
+    self.assertEqual(len(set(map(id, results))), 5)
+    self.assertEqual(len(self.requests), 1)
+
+  def test_default_timeout(self):
+    self.assertEqual(nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret').session().timeout, httpx.Timeout(None))
+
+  def test_timeout(self):
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', timeout=(3.05, 10), transport=httpx.MockTransport(self.handler))
+
+    self.assertEqual(self.run_client('get_balance'), {'key': 'value'})
+    self.assertEqual(self.requests[0].extensions['timeout']['connect'], 3.05)
+    self.assertEqual(self.requests[0].extensions['timeout']['read'], 10)
+
+  def test_hedge(self):
+    async def handler(request):
+      self.requests.append(request)
+
+      if len(self.requests) == 1:
+        await asyncio.sleep(1)
+
+      return httpx.Response(200, json={'value': len(self.requests)})
+
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', hedge=nexmo.Hedge(after=0.05), transport=httpx.MockTransport(handler))
+
+    self.assertEqual(self.run_client('get_balance'), {'value': 2})
+
+  def test_get_message_batching(self):
+    def handler(request):
+      self.requests.append(request)
+
+      return httpx.Response(200, json={'count': 3, 'items': [{'message-id': id} for id in request.url.params.get_list('ids')]})
+
+    self.client = nexmo.AsyncClient(key='nexmo-api-key', secret='nexmo-api-secret', message_lookup_window=0.01, transport=httpx.MockTransport(handler))
+
+    async def run():
+      async with self.client:
+        return await asyncio.gather(*[self.client.get_message(str(n)) for n in range(3)])
+
+    self.assertEqual([result['message-id'] for result in run_until_complete(run())], ['0', '1', '2'])
+    self.assertEqual(len(self.requests), 1)
+
+
+class NexmoWebhookASGITestCase(unittest.TestCase):
+  def test_asgi(self):
+    app = nexmo.webhooks.WebhookApp(workers=1)
+    events = []
+    app.on('inbound', events.append)
+
+    messages = [{'type': 'http.request', 'body': b'messageId=0A0000000123ABCD1&text=Hello', 'more_body': False}]
+    sent = []
+
+    async def receive():
+      return messages.pop(0)
+
+    async def send(message):
+      sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/inbound', 'query_string': b'', 'headers': [(b'content-type', b'application/x-www-form-urlencoded')]}
+
+    run_until_complete(app.asgi(scope, receive, send))
+
+    app.stop()
+
+    self.assertEqual(sent[0]['status'], 200)
+    self.assertEqual(events[0].params['text'], 'Hello')
+
+
+if __name__ == '__main__':
+  unittest.main()